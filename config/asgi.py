@@ -96,6 +96,29 @@ class PathSendApp:
                     }  # type: ignore
                 )
 
+    async def _handle_lifespan(
+        self,
+        scope: t.LifespanScope,
+        receive: t.ASGIReceiveCallable,
+        send: t.ASGISendCallable,
+    ) -> None:
+        # Imported here as it needs the settings, configured further down.
+        from core import natsconn
+
+        while True:
+            message = await receive()
+
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                try:
+                    await natsconn.connection.drain()
+                except Exception as ex:
+                    print("NATS drain failed", repr(ex))
+
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
     async def __call__(
         self,
         scope: t.Scope,
@@ -107,6 +130,8 @@ class PathSendApp:
                 await self._handle_http(scope=scope, receive=receive, send=send)
             case "websocket":
                 await self._handle_websocket(scope=scope, receive=receive, send=send)
+            case "lifespan":
+                await self._handle_lifespan(scope=scope, receive=receive, send=send)
             case unhandled:
                 raise ValueError(f"Unhandled ASGI scope {unhandled}")
 
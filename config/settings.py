@@ -1,3 +1,4 @@
+import json
 import os
 from pathlib import Path
 
@@ -133,3 +134,41 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 # Ollama
 OLLAMA_HOST = os.getenv("OLLAMA_HOST", "localhost")
 OLLAMA_PORT = os.getenv("OLLAMA_PORT", "11434")
+# Generations beyond the limit wait for a slot, up to a bounded queue.
+OLLAMA_MAX_INFLIGHT = int(os.getenv("OLLAMA_MAX_INFLIGHT", "2"))
+OLLAMA_MAX_QUEUE = int(os.getenv("OLLAMA_MAX_QUEUE", "16"))
+OLLAMA_QUEUE_TIMEOUT = float(os.getenv("OLLAMA_QUEUE_TIMEOUT", "10"))
+OLLAMA_RETRY_AFTER = int(os.getenv("OLLAMA_RETRY_AFTER", "5"))
+# Random facts generated ahead of time, 0 disables the pool. A token delay
+# paces pooled facts like a live generation.
+FACT_POOL_SIZE = int(os.getenv("FACT_POOL_SIZE", "8"))
+FACT_POOL_TOKEN_DELAY = float(os.getenv("FACT_POOL_TOKEN_DELAY", "0"))
+# Number of customers picked for the assistant's prompt.
+CUSTOMER_CONTEXT_SIZE = int(os.getenv("CUSTOMER_CONTEXT_SIZE", "20"))
+
+
+# NATS, comma separated server urls.
+NATS_SERVERS = os.getenv("NATS_SERVERS", "nats://localhost:4222").split(",")
+NATS_NAME = os.getenv("NATS_NAME", "simp")
+
+
+# Meilisearch, customers are searched in Postgres when no url is set.
+MEILISEARCH_URL = os.getenv("MEILISEARCH_URL", "")
+MEILISEARCH_API_KEY = os.getenv("MEILISEARCH_API_KEY", "")
+MEILISEARCH_INDEX = os.getenv("MEILISEARCH_INDEX", "customers")
+
+
+# Server sent events
+SSE_COALESCE_WINDOW = float(os.getenv("SSE_COALESCE_WINDOW", "0.005"))
+SSE_COALESCE_MAX_EVENTS = int(os.getenv("SSE_COALESCE_MAX_EVENTS", "64"))
+
+
+# Conway
+CONWAY_ENGINE = os.getenv("CONWAY_ENGINE", "numpy")
+CONWAY_GRID_SIZE = int(os.getenv("CONWAY_GRID_SIZE", "100"))
+# Extra engine arguments, e.g. {"origin": [-50, -50], "generations_per_step": 8}
+CONWAY_ENGINE_OPTIONS = json.loads(os.getenv("CONWAY_ENGINE_OPTIONS", "{}"))
+CONWAY_TICK_INTERVAL = float(os.getenv("CONWAY_TICK_INTERVAL", "0.2"))
+CONWAY_KEYFRAME_INTERVAL = int(os.getenv("CONWAY_KEYFRAME_INTERVAL", "50"))
+# Workers sharing a name share one board in shared memory.
+CONWAY_SHARED_NAME = os.getenv("CONWAY_SHARED_NAME", "conway")
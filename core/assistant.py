@@ -0,0 +1,442 @@
+import asyncio
+import contextlib
+import datetime
+import json
+import time
+import typing as t
+
+import asgiref.sync
+import nats.aio.msg
+import nats.errors
+import nats.js
+import nats.js.api
+import nats.js.errors
+from django.conf import settings
+from django.urls import reverse
+
+from core import llm, metrics, natsconn, prompts, retrieval, sse
+from db import models as db_models
+
+MODEL = "qwen3:0.6b"
+CONTEXT = prompts.CustomerContext(
+    retrieval.get_retriever(), k=settings.CUSTOMER_CONTEXT_SIZE
+)
+
+STREAM = "CUSTOMER_AI"
+SUBJECT = "customer_ai.questions"
+CONSUMER = "customer-ai-workers"
+REPLY_PREFIX = "customer_ai.reply"
+CANCEL_PREFIX = "customer_ai.cancel"
+
+FAILED = b"".join(
+    [sse.encode("llm", "The assistant failed, try again shortly."), sse.encode("end")]
+)
+
+QUEUE_WAIT = metrics.histogram(
+    "customer_ai_queue_wait_seconds",
+    "Time questions waited in the work queue for a worker.",
+)
+QUESTIONS_RETRIED = metrics.counter(
+    "customer_ai_questions_retried_total",
+    "Questions handed back to the work queue as the model was busy or failed.",
+)
+QUESTIONS_CANCELLED = metrics.counter(
+    "customer_ai_questions_cancelled_total",
+    "Questions no longer answered as the client which asked stopped listening.",
+)
+
+TOOLS = [
+    {
+        "type": "function",
+        "function": {
+            "name": "view_customer",
+            "description": "View a customer",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "customer_id": {
+                        "type": "int",
+                        "description": "The customer ID to view",
+                    },
+                },
+                "required": ["customer_id"],
+            },
+        },
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "delete_customer",
+            "description": "Delete a customer",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "customer_id": {
+                        "type": "int",
+                        "description": "The customer ID to delete",
+                    },
+                },
+                "required": ["customer_id"],
+            },
+        },
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "create_customer",
+            "description": "Create a customer",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "name": {
+                        "type": "string",
+                        "description": "The name of the customer",
+                    },
+                    "address": {
+                        "type": "string",
+                        "description": "The address of the customer",
+                    },
+                },
+                "required": ["name"],
+            },
+        },
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "update_customer",
+            "description": "Update a customer",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "customer_id": {
+                        "type": "int",
+                        "description": "The customer ID to view",
+                        "widget": "hidden",
+                    },
+                    "name": {
+                        "type": "string",
+                        "description": "The name of the customer",
+                    },
+                    "address": {
+                        "type": "string",
+                        "description": "The address of the customer",
+                    },
+                },
+                "required": ["customer_id"],
+            },
+        },
+    },
+]
+
+
+async def get_customer(
+    customers: dict[int, db_models.Customer], customer_id: t.Any
+) -> db_models.Customer | None:
+    """The customer a tool call names, from the prompt or else the database."""
+    try:
+        pk = int(customer_id)
+    except (TypeError, ValueError):
+        return None
+
+    if pk in customers:
+        return customers[pk]
+
+    return await db_models.Customer.objects.filter(pk=pk).afirst()
+
+
+async def answer(question: str, requested_at: float) -> t.AsyncIterator[bytes]:
+    """The assistant's reply to ``question`` as encoded SSE events.
+
+    Raises ``llm.Busy`` before anything is yielded when no generation slot
+    is free.
+    """
+    system_prompt, customer_map = await asgiref.sync.sync_to_async(CONTEXT.build)(
+        question
+    )
+
+    # Identical questions asked at the same time share one generation.
+    flight = await llm.client.flight(
+        endpoint="customer_ai",
+        model=MODEL,
+        messages=[
+            {
+                "role": "system",
+                "content": system_prompt,
+            },
+            {
+                "role": "user",
+                "content": f"===Question===\n{question}\n===Question===",
+            },
+        ],
+        tools=TOOLS,
+    )
+
+    stream = llm.time_to_first_token(
+        flight.stream(),
+        model=MODEL,
+        endpoint="customer_ai",
+        requested_at=requested_at,
+    )
+
+    tool_calls = []
+    async with contextlib.aclosing(stream):
+        async for resp in stream:
+            token = resp.message.content
+            yield sse.encode("llm", token)
+
+            if resp.message.tool_calls:
+                tool_calls.extend(resp.message.tool_calls)
+
+    if tool_calls:
+        for tc in tool_calls:
+            function = tc.function
+            fname = function.name
+            arguments = function.arguments
+            anchor = ""
+
+            if fname == "update_customer":
+                try:
+                    customer_id = arguments["customer_id"]
+                except KeyError:
+                    continue
+
+                name = arguments.get("name", "")
+                address = arguments.get("address", "")
+                href = reverse("customer_update", kwargs={"pk": customer_id})
+                href = f"{href}?name={name}&address={address}"
+                message = f"Update Customer {customer_id=}"
+
+                if name:
+                    message += f" {name=}"
+
+                if address:
+                    message += f" {address=}"
+
+                anchor = f'<a class="text-underline text-blue-500" href="{href}">{message}</a>'
+            elif fname == "delete_customer":
+                customer = await get_customer(
+                    customer_map, arguments.get("customer_id")
+                )
+
+                if not customer:
+                    continue
+
+                href = reverse("customer_delete", kwargs={"pk": customer.pk})
+                message = f"Delete Customer - {customer.name}"
+                anchor = f'<a class="text-underline text-blue-500" href="{href}">{message}</a>'
+            elif fname == "view_customer":
+                customer = await get_customer(
+                    customer_map, arguments.get("customer_id")
+                )
+
+                if not customer:
+                    continue
+
+                href = reverse("customer_detail", kwargs={"pk": customer.pk})
+                message = f"View Customer - {customer.name}"
+
+                anchor = f'<a class="text-underline text-blue-500" href="{href}">{message}</a>'
+            elif fname == "create_customer":
+                name = arguments.get("name", "")
+                address = arguments.get("address", "")
+                href = reverse("customer_create")
+                href = f"{href}?name={name}&address={address}"
+                message = "Create Customer"
+
+                if name:
+                    message += f" {name=}"
+
+                if address:
+                    message += f" {address=}"
+
+                anchor = f'<a class="hover:underline text-blue-500" href="{href}">{message}</a>'
+
+            if not anchor:
+                continue
+
+            yield sse.encode("anchor", anchor)
+
+    yield sse.encode("end")
+
+
+def reply_subject(client_id: str) -> str:
+    return f"{REPLY_PREFIX}.{client_id}"
+
+
+def cancel_subject(client_id: str) -> str:
+    return f"{CANCEL_PREFIX}.{client_id}"
+
+
+class WorkQueue:
+    """Questions for the assistant, kept in a JetStream work-queue stream.
+
+    Views publish questions and every ``aiworker`` process pulls them from
+    one durable consumer, so each question is answered once by whichever
+    worker is free and questions wait in the stream while none is running.
+    Answers are published as SSE events to the reply subject of the client
+    which asked. A question is acknowledged once answered, or once its
+    client stopped listening and published to its cancel subject, which
+    stops the generation. One which could not be answered is handed back
+    after ``retry_delay`` seconds, and one whose worker died is redelivered
+    after ``ack_wait`` seconds.
+    """
+
+    def __init__(
+        self,
+        connection: natsconn.NatsConnection,
+        ack_wait: float = 60.0,
+        max_deliver: int = 5,
+        retry_delay: float = 5.0,
+    ) -> None:
+        self.connection = connection
+        self.ack_wait = ack_wait
+        self.max_deliver = max_deliver
+        self.retry_delay = retry_delay
+        self._is_ready = False
+
+    async def _jetstream(self) -> nats.js.JetStreamContext:
+        js = await self.connection.jetstream()
+
+        if not self._is_ready:
+            try:
+                await js.stream_info(STREAM)
+            except nats.js.errors.NotFoundError:
+                await js.add_stream(
+                    name=STREAM,
+                    subjects=[SUBJECT],
+                    retention=nats.js.api.RetentionPolicy.WORK_QUEUE,
+                    storage=nats.js.api.StorageType.FILE,
+                )
+
+            self._is_ready = True
+
+        return js
+
+    async def ask(self, client_id: str, question: str) -> None:
+        js = await self._jetstream()
+        payload = {
+            "q": question,
+            "reply": reply_subject(client_id),
+            "cancel": cancel_subject(client_id),
+        }
+        await js.publish(SUBJECT, json.dumps(payload).encode(), stream=STREAM)
+
+    async def cancel(self, client_id: str) -> None:
+        """Stop answering the questions of a client which stopped listening."""
+        await self.connection.publish(cancel_subject(client_id), b"")
+
+    async def consume(self, concurrency: int, fetch_timeout: float = 5.0) -> None:
+        """Answer questions, ``concurrency`` at a time, until cancelled."""
+        js = await self._jetstream()
+        subscription = await js.pull_subscribe(
+            SUBJECT,
+            durable=CONSUMER,
+            stream=STREAM,
+            config=nats.js.api.ConsumerConfig(
+                ack_wait=self.ack_wait,
+                max_deliver=self.max_deliver,
+                max_ack_pending=-1,
+            ),
+        )
+
+        async def work() -> None:
+            while True:
+                try:
+                    messages = await subscription.fetch(1, timeout=fetch_timeout)
+                except nats.errors.TimeoutError:
+                    continue
+
+                for message in messages:
+                    # A failed ack or publish, say while NATS reconnects, must
+                    # not end the task group and with it every other worker.
+                    try:
+                        await self.handle(message)
+                    except Exception as ex:
+                        print("Handling a question failed", repr(ex))
+
+        async with asyncio.TaskGroup() as group:
+            for _ in range(concurrency):
+                group.create_task(work())
+
+    async def handle(self, message: nats.aio.msg.Msg) -> None:
+        requested_at = time.monotonic()
+        queued_at = message.metadata.timestamp
+        QUEUE_WAIT.labels().observe(
+            (datetime.datetime.now(datetime.UTC) - queued_at).total_seconds()
+        )
+
+        try:
+            payload = json.loads(message.data)
+            question, reply = payload["q"], payload["reply"]
+        except (ValueError, KeyError) as ex:
+            print("Dropping malformed question", repr(ex))
+            await message.term()
+            return
+
+        replying = asyncio.create_task(
+            self._reply(message, question, reply, requested_at)
+        )
+
+        async def cancel(_: nats.aio.msg.Msg) -> None:
+            replying.cancel()
+
+        subscription = None
+
+        try:
+            if "cancel" in payload:
+                subscription = await self.connection.subscribe(
+                    payload["cancel"], cb=cancel
+                )
+
+            await asyncio.wait({replying})
+        finally:
+            replying.cancel()
+
+            if subscription is not None:
+                await natsconn.unsubscribe(subscription)
+
+        if replying.cancelled():
+            QUESTIONS_CANCELLED.inc()
+            await message.ack()
+        else:
+            replying.result()
+
+    async def _reply(
+        self,
+        message: nats.aio.msg.Msg,
+        question: str,
+        reply: str,
+        requested_at: float,
+    ) -> None:
+        # Long answers would otherwise outlast the ack wait and be redelivered.
+        progress_at = requested_at
+        is_started = False
+
+        try:
+            async with contextlib.aclosing(answer(question, requested_at)) as events:
+                async for event in events:
+                    is_started = True
+                    await self.connection.publish(reply, event)
+
+                    if time.monotonic() - progress_at > self.ack_wait / 2:
+                        progress_at = time.monotonic()
+                        await message.in_progress()
+        except Exception as ex:
+            print("Answering a question failed", repr(ex))
+
+            # A partial answer is not repeated, and the last delivery gives up.
+            if is_started or message.metadata.num_delivered >= self.max_deliver:
+                await self.connection.publish(reply, FAILED)
+                await message.term()
+                return
+
+            QUESTIONS_RETRIED.inc()
+            delay = ex.retry_after if isinstance(ex, llm.Busy) else self.retry_delay
+            await message.nak(delay=delay)
+            return
+
+        await message.ack()
+
+
+queue = WorkQueue(natsconn.connection)
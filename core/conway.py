@@ -0,0 +1,852 @@
+import asyncio
+import base64
+import collections
+import contextlib
+import dataclasses
+import functools
+import hashlib
+import multiprocessing
+import multiprocessing.connection
+import multiprocessing.process
+import os
+import time
+import typing as t
+import weakref
+import zlib
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from core import metrics, shm, sse
+
+STEP_SECONDS = metrics.histogram(
+    "conway_step_seconds",
+    "Time an engine took to step one generation.",
+    ("engine",),
+    buckets=(0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1),
+)
+
+
+class Engine(t.Protocol):
+    """Steps a square Game of Life board with non-wrapping edges.
+
+    Cells are exposed as a flat ``uint8`` array of ``size**2`` values, indexed
+    row by row, where 1 is alive and 0 is dead. ``step`` returns the indexes
+    of the cells which flipped. ``state`` is the whole universe, which is
+    more than ``cells`` when the engine only shows a window onto it.
+    """
+
+    size: int
+
+    def seed(self, cells: np.ndarray) -> None: ...
+
+    def step(self) -> np.ndarray: ...
+
+    @property
+    def cells(self) -> np.ndarray: ...
+
+    @property
+    def state(self) -> np.ndarray: ...
+
+
+def random_cells(size: int, density: float = 0.2) -> np.ndarray:
+    rng = np.random.default_rng()
+    return (rng.random(size**2) < density).astype(np.uint8)
+
+
+def pack_bitmap(cells: np.ndarray) -> str:
+    """Pack one bit per cell, most significant bit first, deflate and base64.
+
+    Boards and deltas are mostly runs of zero bytes, which deflate reduces
+    to a few bytes each.
+    """
+    return base64.b64encode(zlib.compress(np.packbits(cells).tobytes(), 1)).decode()
+
+
+@functools.lru_cache(maxsize=8)
+def get_topology(size: int) -> tuple[np.ndarray, np.ndarray]:
+    """Neighbour indexes of every cell as CSR ``(offsets, indexes)``.
+
+    The neighbours of cell ``i`` are ``indexes[offsets[i]:offsets[i + 1]]``.
+    Edges do not wrap, so border cells have three or five neighbours.
+    """
+    positions = np.arange(size**2)
+    rows, columns = np.divmod(positions, size)
+    shifts = [(-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0), (1, 1)]
+
+    neighbours = np.empty((size**2, len(shifts)), dtype=np.intp)
+    is_inside = np.empty((size**2, len(shifts)), dtype=bool)
+
+    for column, (row_shift, column_shift) in enumerate(shifts):
+        neighbour_rows = rows + row_shift
+        neighbour_columns = columns + column_shift
+        is_inside[:, column] = (
+            (0 <= neighbour_rows)
+            & (neighbour_rows < size)
+            & (0 <= neighbour_columns)
+            & (neighbour_columns < size)
+        )
+        neighbours[:, column] = neighbour_rows * size + neighbour_columns
+
+    offsets = np.zeros(size**2 + 1, dtype=np.intp)
+    np.cumsum(is_inside.sum(axis=1), out=offsets[1:])
+    return offsets, neighbours[is_inside]
+
+
+def next_value(value: int, neighbour_live_count: int) -> int:
+    """
+    Any live cell with fewer than two live neighbours dies, as if by underpopulation.
+    Any live cell with two or three live neighbours lives on to the next generation.
+    Any live cell with more than three live neighbours dies, as if by overpopulation.
+    Any dead cell with exactly three live neighbours becomes a live cell, as if by reproduction.
+    """
+    if value and neighbour_live_count in (2, 3):
+        return 1
+    elif not value and neighbour_live_count == 3:
+        return 1
+    else:
+        return 0
+
+
+class PythonEngine:
+    """Reference engine processing one cell at a time."""
+
+    def __init__(self, size: int) -> None:
+        self.size = size
+        offsets, indexes = get_topology(size)
+        self._offsets: list[int] = offsets.tolist()
+        self._indexes: list[int] = indexes.tolist()
+        self._cells = bytearray(size**2)
+
+    def seed(self, cells: np.ndarray) -> None:
+        self._cells = bytearray(cells.tobytes())
+
+    def step(self) -> np.ndarray:
+        cells = self._cells
+        offsets = self._offsets
+        indexes = self._indexes
+        new_cells = bytearray(len(cells))
+        changed = []
+
+        for index, value in enumerate(cells):
+            start, end = offsets[index], offsets[index + 1]
+            neighbour_live_count = sum(cells[i] for i in indexes[start:end])
+            new_value = next_value(value, neighbour_live_count)
+            new_cells[index] = new_value
+
+            if new_value != value:
+                changed.append(index)
+
+        self._cells = new_cells
+        return np.array(changed, dtype=np.intp)
+
+    @property
+    def cells(self) -> np.ndarray:
+        return np.frombuffer(bytes(self._cells), dtype=np.uint8)
+
+    @property
+    def state(self) -> np.ndarray:
+        return self.cells
+
+
+class RowStepper:
+    """Steps a block of rows with buffers allocated once per block shape.
+
+    ``source`` is the block surrounded by a one cell border, where the rows
+    above and below are either dead padding or the neighbouring rows of the
+    board. ``target`` receives the next generation of the block, and may be
+    the interior of ``source``.
+    """
+
+    def __init__(self, rows: int, columns: int) -> None:
+        self._counts = np.zeros((rows, columns), dtype=np.uint8)
+        self._born = np.zeros((rows, columns), dtype=bool)
+        self._survived = np.zeros((rows, columns), dtype=bool)
+
+    def step(self, source: np.ndarray, target: np.ndarray, flipped: np.ndarray) -> None:
+        board = source[1:-1, 1:-1]
+        counts = self._counts
+
+        np.add(source[:-2, :-2], source[:-2, 1:-1], out=counts)
+        counts += source[:-2, 2:]
+        counts += source[1:-1, :-2]
+        counts += source[1:-1, 2:]
+        counts += source[2:, :-2]
+        counts += source[2:, 1:-1]
+        counts += source[2:, 2:]
+
+        np.equal(counts, 3, out=self._born)
+        np.equal(counts, 2, out=self._survived)
+        np.logical_and(self._survived, board, out=self._survived)
+        self._born |= self._survived
+        np.not_equal(board, self._born, out=flipped)
+        target[...] = self._born
+
+
+class NumpyEngine:
+    """Vectorised engine counting neighbours with shifted array views.
+
+    The board is surrounded by a border of dead cells which is never written
+    to, which gives the same non-wrapping edges as ``get_topology``.
+    All buffers are allocated once per size so a step does not allocate.
+    """
+
+    def __init__(self, size: int) -> None:
+        self.size = size
+        self._padded = np.zeros((size + 2, size + 2), dtype=np.uint8)
+        self._flipped = np.zeros((size, size), dtype=bool)
+        self._stepper = RowStepper(size, size)
+
+    @property
+    def _board(self) -> np.ndarray:
+        return self._padded[1:-1, 1:-1]
+
+    def seed(self, cells: np.ndarray) -> None:
+        self._board[...] = cells.reshape(self.size, self.size)
+
+    def step(self) -> np.ndarray:
+        self._stepper.step(self._padded, self._board, self._flipped)
+        return np.flatnonzero(self._flipped)
+
+    @property
+    def cells(self) -> np.ndarray:
+        return self._board.ravel()
+
+    @property
+    def state(self) -> np.ndarray:
+        return self.cells
+
+
+def _shard_worker(
+    names: list[str],
+    size: int,
+    start: int,
+    end: int,
+    conn: multiprocessing.connection.Connection,
+) -> None:
+    segments = [shared_memory.SharedMemory(name=name) for name in names]
+    boards = [
+        np.ndarray((size + 2, size + 2), dtype=np.uint8, buffer=segment.buf)
+        for segment in segments[:2]
+    ]
+    flipped = np.ndarray((size, size), dtype=bool, buffer=segments[2].buf)
+    stepper = RowStepper(end - start, size)
+
+    try:
+        while (front := conn.recv()) is not None:
+            # The halo rows above and below the stripe are read straight
+            # from the neighbouring stripes in the front buffer.
+            stepper.step(
+                boards[front][start : end + 2],
+                boards[1 - front][start + 1 : end + 1, 1:-1],
+                flipped[start:end],
+            )
+            conn.send(True)
+    finally:
+        del boards, flipped
+
+        for segment in segments:
+            segment.close()
+
+
+def _release_shards(
+    segments: list[shared_memory.SharedMemory],
+    workers: list[tuple[multiprocessing.process.BaseProcess, t.Any]],
+) -> None:
+    for process, conn in workers:
+        # A worker which died already closed its end of the pipe.
+        try:
+            conn.send(None)
+        except OSError:
+            pass
+
+        process.join(timeout=1)
+
+    for segment in segments:
+        segment.close()
+        segment.unlink()
+
+
+class ShardedEngine:
+    """Splits the board into horizontal stripes stepped by worker processes.
+
+    The board is double buffered in shared memory, each buffer padded with
+    dead cells like ``NumpyEngine``. Every generation each worker reads its
+    stripe plus one halo row on either side from the front buffer and writes
+    the next generation of the stripe into the back buffer; the buffers are
+    then swapped. Workers are spawned on first use.
+    """
+
+    def __init__(self, size: int, workers: int = 0) -> None:
+        self.size = size
+        self.workers = workers or os.cpu_count() or 1
+        self._front = 0
+        self._segments: list[shared_memory.SharedMemory] = []
+        self._boards: list[np.ndarray] = []
+        self._flipped = np.zeros((size, size), dtype=bool)
+        self._workers: list[tuple[multiprocessing.process.BaseProcess, t.Any]] = []
+
+    def _start(self) -> None:
+        if self._segments:
+            return
+
+        board_bytes = (self.size + 2) ** 2
+        self._segments = [
+            shared_memory.SharedMemory(create=True, size=board_bytes),
+            shared_memory.SharedMemory(create=True, size=board_bytes),
+            shared_memory.SharedMemory(create=True, size=self.size**2),
+        ]
+        self._boards = []
+
+        for segment in self._segments[:2]:
+            board = np.ndarray(
+                (self.size + 2, self.size + 2), dtype=np.uint8, buffer=segment.buf
+            )
+            board[...] = 0
+            self._boards.append(board)
+
+        self._flipped = np.ndarray(
+            (self.size, self.size), dtype=bool, buffer=self._segments[2].buf
+        )
+
+        names = [segment.name for segment in self._segments]
+        context = multiprocessing.get_context("spawn")
+        stripes = np.array_split(np.arange(self.size), min(self.workers, self.size))
+
+        for stripe in stripes:
+            conn, worker_conn = context.Pipe()
+            process = context.Process(
+                target=_shard_worker,
+                args=(
+                    names,
+                    self.size,
+                    int(stripe[0]),
+                    int(stripe[-1]) + 1,
+                    worker_conn,
+                ),
+                daemon=True,
+            )
+            process.start()
+            self._workers.append((process, conn))
+
+        weakref.finalize(self, _release_shards, self._segments, self._workers)
+
+    @property
+    def _board(self) -> np.ndarray:
+        return self._boards[self._front][1:-1, 1:-1]
+
+    def seed(self, cells: np.ndarray) -> None:
+        self._start()
+        self._board[...] = cells.reshape(self.size, self.size)
+
+    def step(self) -> np.ndarray:
+        self._start()
+
+        for _, conn in self._workers:
+            conn.send(self._front)
+
+        for _, conn in self._workers:
+            conn.recv()
+
+        self._front = 1 - self._front
+        return np.flatnonzero(self._flipped)
+
+    @property
+    def cells(self) -> np.ndarray:
+        self._start()
+        return self._board.ravel()
+
+    @property
+    def state(self) -> np.ndarray:
+        return self.cells
+
+
+class SparseEngine:
+    """Stores only the live cells, each packed into one 64 bit key.
+
+    A step gathers the eight neighbour keys of every live cell and counts
+    them with ``np.unique``, so the cost follows the population rather than
+    the area of the board.
+
+    When ``bounded`` the universe is the same ``size`` x ``size`` board as the
+    dense engines. Otherwise it is unbounded and ``cells`` is the ``size`` x
+    ``size`` viewport whose top left corner is at ``origin``; the seed is
+    placed into that viewport. Every step advances ``generations_per_step``
+    generations, which fast forwards sparse universes.
+    """
+
+    _BIAS = 1 << 30
+    _SHIFTS = np.array(
+        [(-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0), (1, 1)],
+        dtype=np.int64,
+    )
+
+    def __init__(
+        self,
+        size: int,
+        bounded: bool = True,
+        origin: tuple[int, int] = (0, 0),
+        generations_per_step: int = 1,
+    ) -> None:
+        self.size = size
+        self.bounded = bounded
+        self.origin = (0, 0) if bounded else origin
+        self.generations_per_step = generations_per_step
+        self._live = np.empty(0, dtype=np.int64)
+        self._viewport = np.zeros(size**2, dtype=np.uint8)
+
+    @classmethod
+    def _pack(cls, rows: np.ndarray, columns: np.ndarray) -> np.ndarray:
+        return ((rows + cls._BIAS) << 32) | (columns + cls._BIAS)
+
+    @classmethod
+    def _unpack(cls, keys: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        return (keys >> 32) - cls._BIAS, (keys & 0xFFFFFFFF) - cls._BIAS
+
+    def seed(self, cells: np.ndarray) -> None:
+        rows, columns = np.divmod(np.flatnonzero(cells).astype(np.int64), self.size)
+        row_origin, column_origin = self.origin
+        self._live = np.sort(self._pack(rows + row_origin, columns + column_origin))
+        self._viewport = self._render()
+
+    def _advance(self) -> None:
+        rows, columns = self._unpack(self._live)
+        neighbour_rows = (rows[:, None] + self._SHIFTS[:, 0]).ravel()
+        neighbour_columns = (columns[:, None] + self._SHIFTS[:, 1]).ravel()
+
+        if self.bounded:
+            is_inside = (
+                (0 <= neighbour_rows)
+                & (neighbour_rows < self.size)
+                & (0 <= neighbour_columns)
+                & (neighbour_columns < self.size)
+            )
+            neighbour_rows = neighbour_rows[is_inside]
+            neighbour_columns = neighbour_columns[is_inside]
+
+        keys, counts = np.unique(
+            self._pack(neighbour_rows, neighbour_columns), return_counts=True
+        )
+        is_live = np.isin(keys, self._live, assume_unique=True)
+        # np.unique sorts, which keeps the live keys sorted for np.isin.
+        self._live = keys[(counts == 3) | ((counts == 2) & is_live)]
+
+    def _render(self) -> np.ndarray:
+        rows, columns = self._unpack(self._live)
+        row_origin, column_origin = self.origin
+        rows = rows - row_origin
+        columns = columns - column_origin
+        is_visible = (0 <= rows) & (rows < self.size)
+        is_visible &= (0 <= columns) & (columns < self.size)
+
+        viewport = np.zeros(self.size**2, dtype=np.uint8)
+        viewport[rows[is_visible] * self.size + columns[is_visible]] = 1
+        return viewport
+
+    def step(self) -> np.ndarray:
+        for _ in range(self.generations_per_step):
+            self._advance()
+
+        viewport = self._render()
+        changed = np.flatnonzero(viewport != self._viewport)
+        self._viewport = viewport
+        return changed
+
+    @property
+    def cells(self) -> np.ndarray:
+        return self._viewport
+
+    @property
+    def state(self) -> np.ndarray:
+        return self._live
+
+
+ENGINES: dict[str, t.Callable[..., Engine]] = {
+    "python": PythonEngine,
+    "numpy": NumpyEngine,
+    "sparse": SparseEngine,
+    "sharded": ShardedEngine,
+    "unbounded": functools.partial(SparseEngine, bounded=False),
+}
+
+
+def get_engine(name: str, size: int, **options: t.Any) -> Engine:
+    try:
+        engine_class = ENGINES[name]
+    except KeyError:
+        raise ValueError(f"Unknown Conway engine {name}")
+
+    return engine_class(size, **options)
+
+
+@dataclasses.dataclass(slots=True, eq=False, repr=False)
+class Frame:
+    epoch: int
+    generation: int
+    cells: np.ndarray
+    changed: np.ndarray
+    is_keyframe: bool
+    period: int = 0
+
+    def follows(self, previous: "Frame | None") -> bool:
+        """Whether ``previous`` was the generation right before this one."""
+        return (
+            previous is not None
+            and previous.epoch == self.epoch
+            and previous.generation + 1 == self.generation
+        )
+
+
+class Board:
+    """Runs a single simulation and broadcasts each generation.
+
+    The ticking task is started by the first subscriber and cancelled when
+    the last one leaves, so a board nobody is watching costs nothing. If it
+    fails, say as a shard worker died, the error is logged and delivered to
+    every subscriber, and the next subscriber starts it again. Slow
+    subscribers skip frames rather than delaying the others; a subscriber
+    which did not see the previous frame has to draw the full board, and
+    every ``keyframe_interval`` generations a frame is marked as a keyframe.
+
+    The digests of the last ``cycle_history`` generations are kept. Once a
+    generation repeats, the board is known to cycle with that period and the
+    engine is no longer stepped; the frames of the cycle are replayed until
+    the board is seeded again. A period of 1 is a still life.
+    """
+
+    def __init__(
+        self,
+        engine: Engine,
+        interval: float,
+        keyframe_interval: int = 50,
+        cycle_history: int = 64,
+        queue_size: int = 2,
+    ) -> None:
+        self.engine = engine
+        self.interval = interval
+        self.keyframe_interval = keyframe_interval
+        self.epoch = 0
+        self.generation = 0
+        self.period = 0
+        self._cycle_history = cycle_history
+        self._digests: collections.OrderedDict[bytes, int] = collections.OrderedDict()
+        self._recent: collections.deque[Frame] = collections.deque(maxlen=cycle_history)
+        self._queue_size = queue_size
+        self._subscribers: set[asyncio.Queue[Frame | Exception]] = set()
+        self._task: asyncio.Task | None = None
+        self._step_seconds = STEP_SECONDS.labels(engine=type(engine).__name__)
+
+    @property
+    def size(self) -> int:
+        return self.engine.size
+
+    def seed(self, cells: np.ndarray) -> None:
+        self._load(cells, self.epoch + 1, 0)
+
+    async def aseed(self, cells: np.ndarray) -> None:
+        self.seed(cells)
+
+    def _load(self, cells: np.ndarray, epoch: int, generation: int) -> None:
+        self.engine.seed(cells)
+        self.epoch = epoch
+        self.generation = generation
+        self.period = 0
+        self._digests.clear()
+        self._recent.clear()
+        self._detect_period(self.engine.state)
+
+    def _publish(self, frame: Frame | Exception) -> None:
+        for queue in self._subscribers:
+            sse.put_latest(queue, frame)
+
+    def _detect_period(self, state: np.ndarray) -> int:
+        digest = hashlib.blake2b(state.tobytes(), digest_size=16).digest()
+        seen_at = self._digests.get(digest)
+
+        if seen_at is not None:
+            return self.generation - seen_at
+
+        self._digests[digest] = self.generation
+
+        if len(self._digests) > self._cycle_history:
+            self._digests.popitem(last=False)
+
+        return 0
+
+    def _step(self) -> tuple[np.ndarray, np.ndarray, int]:
+        start_time = time.monotonic()
+        changed = self.engine.step()
+        cells = self.engine.cells
+        self._step_seconds.observe(time.monotonic() - start_time)
+        return changed, cells, self._detect_period(self.engine.state)
+
+    async def _next_frame(self) -> Frame:
+        self.generation += 1
+
+        if self.period:
+            # The generation one period ago looks exactly like this one.
+            replayed = self._recent[-self.period]
+            cells = replayed.cells
+            changed = replayed.changed
+        else:
+            # Large boards take tens of milliseconds to step, which would
+            # hold up every other request of the worker.
+            changed, cells, self.period = await asyncio.to_thread(self._step)
+
+        frame = Frame(
+            epoch=self.epoch,
+            generation=self.generation,
+            cells=cells,
+            changed=changed,
+            is_keyframe=self.generation % self.keyframe_interval == 0,
+            period=self.period,
+        )
+        self._recent.append(frame)
+        return frame
+
+    async def _run(self) -> None:
+        while True:
+            start_time = time.monotonic()
+            self._publish(await self._next_frame())
+
+            total_seconds = time.monotonic() - start_time
+            await asyncio.sleep(max(0.0, self.interval - total_seconds))
+
+    def _run_done(self, task: asyncio.Task) -> None:
+        if task.cancelled() or task.exception() is None:
+            return
+
+        ex = task.exception()
+        print("Conway board failed", repr(ex))
+        self._publish(ex)
+
+    @contextlib.asynccontextmanager
+    async def subscribe(self) -> t.AsyncIterator[asyncio.Queue[Frame | Exception]]:
+        queue: asyncio.Queue[Frame | Exception] = asyncio.Queue(self._queue_size)
+        self._subscribers.add(queue)
+
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+            self._task.add_done_callback(self._run_done)
+
+        try:
+            yield queue
+        finally:
+            self._subscribers.discard(queue)
+
+            if not self._subscribers and self._task:
+                self._task.cancel()
+                self._task = None
+
+
+class SharedBoard(Board):
+    """A board shared by every worker process of the server.
+
+    The latest generation lives in a shared memory segment together with its
+    epoch, generation and period. Every worker with subscribers polls the
+    segment and publishes a frame whenever the generation changes, working
+    out the changed cells against the previous frame it read.
+
+    Only the worker holding the leader lock steps the engine. Any worker with
+    subscribers tries to take the lock, and the leader gives it up when its
+    last subscriber leaves, so exactly one worker ticks while anyone is
+    watching. A new leader, or the leader after any worker seeded the board,
+    loads the shared cells into its engine before stepping; an unbounded
+    engine therefore continues from the viewport only.
+
+    Writers hold a file lock and readers use the sequence number in the
+    header as a seqlock: it is odd while a write is in progress. A reader
+    retries ``read_attempts`` times, yielding to the event loop in between,
+    and otherwise skips the tick. A sequence left odd by a writer which died
+    mid-write is repaired once the write lock turns out to be free.
+    """
+
+    _SEQUENCE, _EPOCH, _GENERATION, _PERIOD = range(4)
+    _HEADER_BYTES = 64
+
+    def __init__(
+        self,
+        engine: Engine,
+        interval: float,
+        name: str = "conway",
+        keyframe_interval: int = 50,
+        cycle_history: int = 64,
+        queue_size: int = 2,
+        poll_interval: float | None = None,
+        read_attempts: int = 100,
+    ) -> None:
+        super().__init__(
+            engine,
+            interval,
+            keyframe_interval=keyframe_interval,
+            cycle_history=cycle_history,
+            queue_size=queue_size,
+        )
+        self.name = f"{name}-{engine.size}"
+        self.poll_interval = interval / 4 if poll_interval is None else poll_interval
+        self.read_attempts = read_attempts
+        self._write_lock = shm.FileLock(f"{self.name}.write")
+        self._leader_lock = shm.FileLock(f"{self.name}.leader")
+        self._segment: shared_memory.SharedMemory | None = None
+        self._header = np.zeros(4, dtype=np.int64)
+        self._cells = np.zeros(engine.size**2, dtype=np.uint8)
+        self._frame: Frame | None = None
+
+    def _attach(self) -> None:
+        if self._segment is not None:
+            return
+
+        self._segment = shm.open_segment(self.name, self._HEADER_BYTES + self.size**2)
+        self._header = np.ndarray((4,), dtype=np.int64, buffer=self._segment.buf)
+        self._cells = np.ndarray(
+            (self.size**2,),
+            dtype=np.uint8,
+            buffer=self._segment.buf,
+            offset=self._HEADER_BYTES,
+        )
+
+    @contextlib.contextmanager
+    def _writing(self) -> t.Iterator[np.ndarray]:
+        """Marks a write in progress, the caller holds the write lock."""
+        self._header[self._SEQUENCE] += 1
+
+        try:
+            yield self._header
+        finally:
+            self._header[self._SEQUENCE] += 1
+
+    @contextlib.asynccontextmanager
+    async def _awriting(self) -> t.AsyncIterator[np.ndarray]:
+        # Nothing is awaited while the lock is held, so writes by tasks of
+        # the same process, which share the lock's file, never interleave.
+        async with self._write_lock:
+            with self._writing() as header:
+                yield header
+
+    def _recover(self, sequence: int) -> None:
+        """Ends the write of a worker which died with ``sequence`` odd."""
+        # The kernel released the dead writer's lock, so the lock is only
+        # free while the sequence is odd if nobody is writing.
+        if not self._write_lock.acquire(blocking=False):
+            return
+
+        try:
+            if self._header[self._SEQUENCE] == sequence:
+                self._header[self._SEQUENCE] += 1
+        finally:
+            self._write_lock.release()
+
+    async def _read(self) -> tuple[int, int, int, np.ndarray] | None:
+        header = self._header
+
+        for _ in range(self.read_attempts):
+            sequence = int(header[self._SEQUENCE])
+
+            if sequence % 2:
+                await asyncio.sleep(0)
+                continue
+
+            epoch = int(header[self._EPOCH])
+            generation = int(header[self._GENERATION])
+            period = int(header[self._PERIOD])
+            cells = self._cells.copy()
+
+            if sequence == header[self._SEQUENCE]:
+                return epoch, generation, period, cells
+
+            await asyncio.sleep(0)
+
+        if sequence % 2:
+            self._recover(sequence)
+
+        return None
+
+    def _store_seed(self, header: np.ndarray, cells: np.ndarray) -> None:
+        self._cells[...] = cells
+        header[self._EPOCH] += 1
+        header[self._GENERATION] = 0
+        header[self._PERIOD] = 0
+
+    def seed(self, cells: np.ndarray) -> None:
+        """Seeds the board, blocking on the write lock; prefer ``aseed``."""
+        self._attach()
+
+        with self._write_lock, self._writing() as header:
+            self._store_seed(header, cells)
+
+    async def aseed(self, cells: np.ndarray) -> None:
+        self._attach()
+
+        async with self._awriting() as header:
+            self._store_seed(header, cells)
+
+    async def _tick(self) -> None:
+        state = await self._read()
+
+        if state is None:
+            return
+
+        epoch, generation, _, cells = state
+
+        if (epoch, generation) != (self.epoch, self.generation):
+            self._load(cells, epoch, generation)
+
+        frame = await self._next_frame()
+
+        async with self._awriting() as header:
+            # A worker may have seeded the board while the engine stepped.
+            if header[self._EPOCH] == epoch and header[self._GENERATION] == generation:
+                self._cells[...] = frame.cells
+                header[self._GENERATION] = frame.generation
+                header[self._PERIOD] = frame.period
+
+    async def _poll(self) -> None:
+        previous = self._frame
+        header = self._header
+
+        if (
+            previous is not None
+            and previous.epoch == header[self._EPOCH]
+            and previous.generation == header[self._GENERATION]
+        ):
+            return
+
+        state = await self._read()
+
+        if state is None:
+            return
+
+        epoch, generation, period, cells = state
+
+        if previous is None:
+            changed = np.flatnonzero(cells)
+        else:
+            changed = np.flatnonzero(cells != previous.cells)
+
+        self._frame = Frame(
+            epoch=epoch,
+            generation=generation,
+            cells=cells,
+            changed=changed,
+            is_keyframe=generation % self.keyframe_interval == 0,
+            period=period,
+        )
+        self._publish(self._frame)
+
+    async def _run(self) -> None:
+        self._attach()
+        loop = asyncio.get_running_loop()
+        next_tick = loop.time()
+
+        try:
+            while True:
+                if loop.time() >= next_tick:
+                    next_tick = max(next_tick + self.interval, loop.time())
+
+                    if self._leader_lock.acquire(blocking=False):
+                        await self._tick()
+
+                await self._poll()
+                await asyncio.sleep(self.poll_interval)
+        finally:
+            self._leader_lock.release()
@@ -0,0 +1,109 @@
+import asyncio
+import collections
+import typing as t
+
+from django.conf import settings
+
+from core import llm, metrics
+
+MODEL = "qwen3:0.6b"
+MESSAGES = [
+    {
+        "role": "user",
+        "content": "Generate a random fact.",
+    }
+]
+
+FACT_POOL_HITS = metrics.counter(
+    "fact_pool_hits_total", "Random facts served from the pool."
+)
+FACT_POOL_MISSES = metrics.counter(
+    "fact_pool_misses_total", "Random facts generated live as the pool was empty."
+)
+
+
+class FactPool:
+    """Keeps a bounded pool of pre-generated facts topped up.
+
+    Facts do not depend on who asks, so they are generated ahead of time by
+    a background task and handed out whole. The producer only starts a
+    generation while the client has nothing in flight and nobody waiting,
+    so it soaks up idle capacity without delaying live requests. It is
+    started by the first ``take`` and retries after ``retry_delay`` when
+    the model is unreachable.
+    """
+
+    def __init__(
+        self,
+        client: llm.LLMClient,
+        maxsize: int,
+        idle_delay: float = 0.5,
+        retry_delay: float = 5.0,
+    ) -> None:
+        self.client = client
+        self.maxsize = maxsize
+        self.idle_delay = idle_delay
+        self.retry_delay = retry_delay
+        self._facts: collections.deque[list[str]] = collections.deque()
+        self._wanted = asyncio.Event()
+        self._task: asyncio.Task | None = None
+
+    def __len__(self) -> int:
+        return len(self._facts)
+
+    def take(self) -> list[str] | None:
+        """The tokens of a pooled fact, or ``None`` when the pool is empty."""
+        if self.maxsize and (self._task is None or self._task.done()):
+            self._task = asyncio.create_task(self._produce())
+
+        self._wanted.set()
+
+        if not self._facts:
+            FACT_POOL_MISSES.inc()
+            return None
+
+        FACT_POOL_HITS.inc()
+        return self._facts.popleft()
+
+    def _is_idle(self) -> bool:
+        return not self.client.inflight and not self.client.waiting
+
+    async def _generate(self) -> list[str]:
+        lease = await self.client.acquire()
+        return [
+            response.message.content
+            async for response in lease.chat(model=MODEL, messages=MESSAGES)
+        ]
+
+    async def _produce(self) -> None:
+        while True:
+            if len(self._facts) >= self.maxsize:
+                self._wanted.clear()
+                await self._wanted.wait()
+                continue
+
+            if not self._is_idle():
+                await asyncio.sleep(self.idle_delay)
+                continue
+
+            try:
+                self._facts.append(await self._generate())
+            except llm.Busy:
+                await asyncio.sleep(self.idle_delay)
+            except Exception as ex:
+                print("Fact generation failed", repr(ex))
+                await asyncio.sleep(self.retry_delay)
+
+
+async def replay(
+    tokens: t.Iterable[str], token_delay: float = 0.0
+) -> t.AsyncIterator[str]:
+    """Hand out pooled tokens, optionally paced like a live generation."""
+    for token in tokens:
+        yield token
+
+        if token_delay:
+            await asyncio.sleep(token_delay)
+
+
+pool = FactPool(llm.client, maxsize=settings.FACT_POOL_SIZE)
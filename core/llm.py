@@ -0,0 +1,387 @@
+import asyncio
+import contextlib
+import functools
+import hashlib
+import json
+import time
+import typing as t
+import weakref
+
+import ollama
+from django.conf import settings
+from django.http import HttpResponse
+
+from core import metrics
+
+
+class Busy(Exception):
+    """Raised when no generation slot is available within the queue limits."""
+
+    def __init__(self, retry_after: int) -> None:
+        super().__init__("The LLM backend is busy.")
+        self.retry_after = retry_after
+
+
+class Cancelled(Exception):
+    """Raised to requests following a generation which was cancelled."""
+
+    def __init__(self) -> None:
+        super().__init__("The generation was cancelled.")
+
+
+def busy_response(ex: Busy) -> HttpResponse:
+    return HttpResponse(
+        b"The LLM backend is busy, try again shortly.",
+        status=503,
+        headers={"Retry-After": f"{ex.retry_after}"},
+    )
+
+
+class Lease:
+    """A generation slot held until released or garbage collected.
+
+    A lease handed to a streaming response may never be iterated when the
+    client goes away first, so the slot is also returned when the lease is
+    collected. Releasing is idempotent.
+    """
+
+    def __init__(self, client: ollama.AsyncClient, semaphore: asyncio.Semaphore):
+        self.client = client
+        self._release = weakref.finalize(self, semaphore.release)
+
+    def release(self) -> None:
+        self._release()
+
+    async def chat(self, **kwargs: t.Any) -> t.AsyncIterator[ollama.ChatResponse]:
+        """Stream a chat completion and release the slot once it is over.
+
+        When the consumer goes away, either by closing this generator or by
+        cancelling the task iterating it, the upstream stream is closed
+        straight away. That drops the HTTP request, which makes Ollama stop
+        generating, rather than leaving it to the garbage collector.
+        """
+        try:
+            stream = await self.client.chat(stream=True, **kwargs)
+
+            async with contextlib.aclosing(stream):
+                async for response in stream:
+                    yield response
+        finally:
+            self.release()
+
+
+async def instrument(
+    stream: t.AsyncIterator[ollama.ChatResponse], model: str, endpoint: str
+) -> t.AsyncIterator[ollama.ChatResponse]:
+    """Record the metrics of a generation as its chunks arrive from upstream.
+
+    Used on the stream a ``Flight`` drives, so a generation is measured once
+    however many requests follow it, and late joiners replaying buffered
+    chunks do not skew the token latency.
+    """
+    labels = {"model": model, "endpoint": endpoint}
+    inter_token_latency = metrics.LLM_INTER_TOKEN_LATENCY.labels(**labels)
+    first_token_at = previous_token_at = 0.0
+    tokens = 0
+    is_done = False
+
+    try:
+        async with contextlib.aclosing(stream):  # type: ignore[type-var]
+            async for response in stream:
+                now = time.monotonic()
+
+                if tokens:
+                    inter_token_latency.observe(now - previous_token_at)
+                else:
+                    first_token_at = now
+
+                tokens += 1
+                previous_token_at = now
+                is_done = response.done
+
+                for tool_call in response.message.tool_calls or []:
+                    metrics.LLM_TOOL_CALLS.labels(
+                        **labels, function=tool_call.function.name
+                    ).inc()
+
+                yield response
+    except (asyncio.CancelledError, GeneratorExit):
+        if not is_done:
+            metrics.LLM_STREAMS_CANCELLED.labels(**labels).inc()
+            metrics.LLM_TOKENS_WASTED.labels(**labels).inc(tokens)
+        raise
+
+    duration = previous_token_at - first_token_at
+
+    if tokens > 1 and duration > 0:
+        metrics.LLM_TOKENS_PER_SECOND.labels(**labels).observe((tokens - 1) / duration)
+
+
+async def time_to_first_token(
+    stream: t.AsyncIterator[ollama.ChatResponse],
+    model: str,
+    endpoint: str,
+    requested_at: float,
+) -> t.AsyncIterator[ollama.ChatResponse]:
+    """Record when a request's first chunk arrived.
+
+    ``requested_at`` is the ``time.monotonic()`` of the request, so the time
+    includes waiting for a slot, or for the generation it joined.
+    """
+    is_first = True
+
+    async with contextlib.aclosing(stream):  # type: ignore[type-var]
+        async for response in stream:
+            if is_first:
+                is_first = False
+                metrics.LLM_TIME_TO_FIRST_TOKEN.labels(
+                    model=model, endpoint=endpoint
+                ).observe(time.monotonic() - requested_at)
+
+            yield response
+
+
+def flight_key(**kwargs: t.Any) -> str:
+    """Identifies a generation by its model, messages and tools."""
+    payload = json.dumps(kwargs, sort_keys=True, default=str)
+    return hashlib.blake2b(payload.encode(), digest_size=16).hexdigest()
+
+
+class Flight:
+    """A single generation shared by every identical request.
+
+    The upstream stream is driven by its own task and every chunk is kept,
+    so a request joining late replays the chunks already emitted before
+    following the live tail. Every request which joined is a ``Follower``
+    until it stops streaming, and the generation is cancelled when the last
+    one leaves. A cancelled generation fails with ``Cancelled`` so nobody
+    mistakes what it emitted for a complete answer.
+    """
+
+    def __init__(self, on_done: t.Callable[["Flight"], None]) -> None:
+        self.chunks: list[ollama.ChatResponse] = []
+        self.error: BaseException | None = None
+        self.is_done = False
+        self._on_done = on_done
+        self._started = asyncio.Event()
+        self._changed = asyncio.Event()
+        self._subscribers = 0
+        self._task: asyncio.Task | None = None
+
+    def _notify(self) -> None:
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    def start(self, lease: Lease, endpoint: str, kwargs: dict[str, t.Any]) -> None:
+        self._task = asyncio.create_task(self._run(lease, endpoint, kwargs))
+        # A task cancelled before it ran never enters ``_run``, so the lease
+        # and the outcome are settled once it is done instead.
+        self._task.add_done_callback(lambda task: self._finish(task, lease))
+        self._started.set()
+
+    def _finish(self, task: asyncio.Task, lease: Lease) -> None:
+        lease.release()
+
+        if task.cancelled() and self.error is None:
+            self.error = Cancelled()
+
+        self.is_done = True
+        self._on_done(self)
+        self._notify()
+
+    def fail(self, ex: BaseException) -> None:
+        self.error = ex
+        self.is_done = True
+        self._on_done(self)
+        self._started.set()
+
+    def _leave(self) -> None:
+        self._subscribers -= 1
+
+        if not self._subscribers and self._task and not self._task.done():
+            # Nobody else may join a generation which is being cancelled.
+            self._on_done(self)
+            self._task.cancel()
+
+    async def wait_started(self) -> None:
+        await self._started.wait()
+
+        if self._task is None and self.error:
+            raise self.error
+
+    async def _run(self, lease: Lease, endpoint: str, kwargs: dict[str, t.Any]) -> None:
+        stream = instrument(
+            lease.chat(**kwargs), model=kwargs.get("model", ""), endpoint=endpoint
+        )
+
+        try:
+            async with contextlib.aclosing(stream):
+                async for chunk in stream:
+                    self.chunks.append(chunk)
+                    self._notify()
+        except Exception as ex:
+            self.error = ex
+
+    async def replay(self) -> t.AsyncIterator[ollama.ChatResponse]:
+        index = 0
+
+        while True:
+            if index < len(self.chunks):
+                index += 1
+                yield self.chunks[index - 1]
+            elif self.is_done:
+                if self.error:
+                    raise self.error
+                return
+            else:
+                await self._changed.wait()
+
+
+class Follower:
+    """A request's share of a flight, from joining until it stops streaming.
+
+    Joining counts straight away, so a request which has not started reading
+    yet keeps the generation alive. A follower leaves when its stream is
+    closed or, like a ``Lease``, when it is garbage collected without ever
+    being streamed. Leaving is idempotent.
+    """
+
+    def __init__(self, flight: Flight) -> None:
+        self.flight = flight
+        flight._subscribers += 1
+        self._leave = weakref.finalize(self, flight._leave)
+
+    def leave(self) -> None:
+        self._leave()
+
+    async def stream(self) -> t.AsyncIterator[ollama.ChatResponse]:
+        try:
+            async for chunk in self.flight.replay():
+                yield chunk
+        finally:
+            self.leave()
+
+
+class LLMClient:
+    """Process wide Ollama client limiting the generations in flight.
+
+    The underlying ``ollama.AsyncClient`` is created once per process, so its
+    keep-alive connections are reused by every request. At most
+    ``max_inflight`` generations run at once. Up to ``max_queue`` more wait
+    for a slot for at most ``queue_timeout`` seconds; anything beyond that is
+    rejected straight away with ``Busy``.
+
+    Identical chat requests made while one is in flight share it, see
+    ``Flight``, so they cost one generation and one slot.
+    """
+
+    def __init__(
+        self,
+        host: str,
+        max_inflight: int,
+        max_queue: int,
+        queue_timeout: float,
+        retry_after: int,
+    ) -> None:
+        self.host = host
+        self.max_inflight = max_inflight
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.retry_after = retry_after
+        self.waiting = 0
+        self._semaphore = asyncio.Semaphore(max_inflight)
+        self._client: ollama.AsyncClient | None = None
+        self._flights: dict[str, Flight] = {}
+
+    @property
+    def client(self) -> ollama.AsyncClient:
+        if self._client is None:
+            self._client = ollama.AsyncClient(host=self.host)
+
+        return self._client
+
+    @property
+    def inflight(self) -> int:
+        return self.max_inflight - self._semaphore._value
+
+    async def acquire(self) -> Lease:
+        if self._semaphore.locked() and self.waiting >= self.max_queue:
+            raise Busy(self.retry_after)
+
+        self.waiting += 1
+
+        try:
+            async with asyncio.timeout(self.queue_timeout):
+                await self._semaphore.acquire()
+        except TimeoutError:
+            raise Busy(self.retry_after) from None
+        finally:
+            self.waiting -= 1
+
+        return Lease(self.client, self._semaphore)
+
+    async def flight(self, endpoint: str = "", **kwargs: t.Any) -> Follower:
+        """Join the identical generation in flight or start a new one.
+
+        The time spent waiting for a slot is recorded against ``endpoint``.
+        Requests which joined while the slot was awaited share its outcome
+        when the queue turned it away with ``Busy``, but when the request
+        waiting was cancelled instead they try again, one of them taking its
+        place.
+        """
+        key = flight_key(**kwargs)
+
+        while True:
+            flight = self._flights.get(key)
+
+            if flight is not None:
+                follower = Follower(flight)
+
+                try:
+                    await flight.wait_started()
+                except Cancelled:
+                    follower.leave()
+                    continue
+                except BaseException:
+                    follower.leave()
+                    raise
+
+                metrics.LLM_GENERATIONS_SHARED.labels(
+                    model=kwargs.get("model", ""), endpoint=endpoint
+                ).inc()
+                return follower
+
+            flight = Flight(on_done=functools.partial(self._end_flight, key))
+            self._flights[key] = flight
+            follower = Follower(flight)
+            started_at = time.monotonic()
+
+            try:
+                lease = await self.acquire()
+            except Busy as ex:
+                flight.fail(ex)
+                follower.leave()
+                raise
+            except BaseException:
+                flight.fail(Cancelled())
+                follower.leave()
+                raise
+
+            metrics.LLM_QUEUE_WAIT.labels(
+                model=kwargs.get("model", ""), endpoint=endpoint
+            ).observe(time.monotonic() - started_at)
+            flight.start(lease, endpoint, kwargs)
+            return follower
+
+    def _end_flight(self, key: str, flight: Flight) -> None:
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+
+
+client = LLMClient(
+    host=f"http://{settings.OLLAMA_HOST}:{settings.OLLAMA_PORT}",
+    max_inflight=settings.OLLAMA_MAX_INFLIGHT,
+    max_queue=settings.OLLAMA_MAX_QUEUE,
+    queue_timeout=settings.OLLAMA_QUEUE_TIMEOUT,
+    retry_after=settings.OLLAMA_RETRY_AFTER,
+)
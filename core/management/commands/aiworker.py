@@ -0,0 +1,72 @@
+import asyncio
+import typing as t
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandParser
+
+from core import assistant, metrics, natsconn
+
+
+async def serve_metrics(
+    reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+) -> None:
+    """Answers any request with the metrics, which only this process records."""
+    try:
+        await reader.readuntil(b"\r\n\r\n")
+        body = metrics.render().encode()
+        writer.write(
+            b"HTTP/1.1 200 OK\r\n"
+            b"Content-Type: text/plain; version=0.0.4; charset=utf-8\r\n"
+            b"Content-Length: %d\r\n"
+            b"Connection: close\r\n\r\n%b" % (len(body), body)
+        )
+        await writer.drain()
+    except (ConnectionError, asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+        pass
+    finally:
+        writer.close()
+
+
+async def work(concurrency: int, metrics_host: str, metrics_port: int | None) -> None:
+    server = None
+
+    if metrics_port is not None:
+        server = await asyncio.start_server(serve_metrics, metrics_host, metrics_port)
+        print(f"AI worker metrics on http://{metrics_host}:{metrics_port}/metrics/")
+
+    try:
+        await assistant.queue.consume(concurrency)
+    finally:
+        if server is not None:
+            server.close()
+
+        await natsconn.connection.drain()
+
+
+class Command(BaseCommand):
+    help = "Answers the customer assistant's questions from the JetStream work queue."
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=settings.OLLAMA_MAX_INFLIGHT,
+            help="Questions answered at once by this worker.",
+        )
+        parser.add_argument("--metrics-host", default="127.0.0.1")
+        parser.add_argument(
+            "--metrics-port",
+            type=int,
+            default=None,
+            help="Serve the worker's metrics, which /metrics/ does not have.",
+        )
+
+    def handle(self, *args: object, **options: t.Any) -> None:
+        print(f"AI worker answering {options['concurrency']} questions at a time")
+        asyncio.run(
+            work(
+                options["concurrency"],
+                options["metrics_host"],
+                options["metrics_port"],
+            )
+        )
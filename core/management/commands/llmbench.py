@@ -0,0 +1,216 @@
+import asyncio
+import contextlib
+import dataclasses
+import statistics
+import time
+import typing as t
+
+import httpx
+from django.core.management.base import BaseCommand, CommandParser
+
+TARGETS = {
+    "sse": "/sse/",
+    "customer_ai": "/customers/ai/sse/",
+}
+
+
+@dataclasses.dataclass(slots=True)
+class StreamResult:
+    status: int = 0
+    connected_at: float = 0.0
+    asked_at: float = 0.0
+    token_times: list[float] = dataclasses.field(default_factory=list)
+    is_complete: bool = False
+    error: str = ""
+
+
+def summarise(name: str, values: list[float], scale: float = 1000.0) -> str:
+    if not values:
+        return f"{name}: no samples"
+
+    if len(values) > 1:
+        quantiles = statistics.quantiles(values, n=100, method="inclusive")
+        p50, p95, p99 = quantiles[49], quantiles[94], quantiles[98]
+    else:
+        p50 = p95 = p99 = values[0]
+
+    return (
+        f"{name}: n={len(values)} mean={statistics.fmean(values) * scale:.2f}"
+        f" p50={p50 * scale:.2f} p95={p95 * scale:.2f} p99={p99 * scale:.2f}"
+    )
+
+
+async def read_stream(
+    client: httpx.AsyncClient, url: str, ends: int, timeout: float, questions: int
+) -> StreamResult:
+    """Read ``llm`` events until ``ends`` answers have ended.
+
+    With ``questions`` the stream asks them itself once subscribed, as
+    answers only go to the client which asked.
+    """
+    result = StreamResult()
+    requested_at = result.asked_at = time.monotonic()
+
+    try:
+        async with asyncio.timeout(timeout):
+            async with client.stream("GET", url) as response:
+                result.status = response.status_code
+                result.connected_at = time.monotonic() - requested_at
+
+                if response.status_code != 200:
+                    return result
+
+                event = ""
+
+                async for line in response.aiter_lines():
+                    if line.startswith("event: "):
+                        event = line.removeprefix("event: ")
+                    elif line or not event:
+                        continue
+                    elif event == "connected" and questions:
+                        result.asked_at = await post_questions(client, url, questions)
+                    elif event == "llm":
+                        result.token_times.append(time.monotonic())
+                    elif event == "end":
+                        ends -= 1
+
+                        if not ends:
+                            result.is_complete = True
+                            break
+    except (TimeoutError, httpx.HTTPError) as ex:
+        result.error = type(ex).__name__
+
+    return result
+
+
+async def get_mock_config(ollama_url: str) -> dict[str, t.Any]:
+    try:
+        async with httpx.AsyncClient(base_url=ollama_url) as client:
+            response = await client.get("/api/mock")
+            return response.json()
+    except (httpx.HTTPError, ValueError):
+        return {}
+
+
+async def post_questions(client: httpx.AsyncClient, url: str, questions: int) -> float:
+    """Ask the questions, return when it began."""
+    response = await client.get("/customers/")
+    csrf_token = response.cookies.get("csrftoken", "")
+    asked_at = time.monotonic()
+
+    for index in range(questions):
+        await client.post(
+            url,
+            json={"q": f"View customer {index + 1}"},
+            headers={"X-CSRFToken": csrf_token},
+        )
+
+    return asked_at
+
+
+async def run(options: dict[str, t.Any]) -> list[str]:
+    url = TARGETS[options["target"]]
+    streams = options["streams"]
+    mock_before = await get_mock_config(options["ollama_url"])
+    limits = httpx.Limits(max_connections=streams + 2)
+    timeout = httpx.Timeout(options["timeout"])
+
+    is_customer_ai = options["target"] == "customer_ai"
+    questions = options["questions"] if is_customer_ai else 0
+
+    async with contextlib.AsyncExitStack() as stack:
+        # Every assistant stream is a separate client with its own session.
+        clients = [
+            await stack.enter_async_context(
+                httpx.AsyncClient(
+                    base_url=options["url"], limits=limits, timeout=timeout
+                )
+            )
+            for _ in range(streams if is_customer_ai else 1)
+        ]
+        requested_at = time.monotonic()
+        tasks = [
+            asyncio.create_task(
+                read_stream(
+                    clients[index % len(clients)],
+                    url,
+                    questions or 1,
+                    options["timeout"],
+                    questions,
+                )
+            )
+            for index in range(streams)
+        ]
+        results = await asyncio.gather(*tasks)
+        total_seconds = time.monotonic() - requested_at
+
+    mock_after = await get_mock_config(options["ollama_url"])
+    statuses: dict[int, int] = {}
+    errors: dict[str, int] = {}
+
+    for result in results:
+        statuses[result.status] = statuses.get(result.status, 0) + 1
+
+        if result.error:
+            errors[result.error] = errors.get(result.error, 0) + 1
+
+    first_tokens = [r.token_times[0] - r.asked_at for r in results if r.token_times]
+    gaps = [
+        later - earlier
+        for r in results
+        for earlier, later in zip(r.token_times, r.token_times[1:])
+    ]
+    tokens = sum(len(r.token_times) for r in results)
+    lines = [
+        f"{streams} streams of {url} in {total_seconds:.2f}s",
+        f"statuses: {statuses} errors: {errors}",
+        f"complete: {sum(r.is_complete for r in results)} tokens: {tokens}"
+        f" ({tokens / total_seconds:.0f}/s)",
+        summarise("connect ms", [r.connected_at for r in results if r.status]),
+        summarise("first token ms", first_tokens),
+        summarise("inter token ms", gaps),
+    ]
+
+    if mock_before and mock_after:
+        config = mock_after["config"]
+        interval = 1 / config["token_rate"]
+        generations = (
+            mock_after["stats"]["generations"] - mock_before["stats"]["generations"]
+        )
+        lines.append(f"mock generations: {generations}")
+
+        # Whatever the mock did not spend is spent by the server.
+        if first_tokens:
+            overhead = [value - config["ttft"] for value in first_tokens]
+            lines.append(summarise("server overhead per stream ms", overhead))
+
+        if gaps:
+            overhead = [gap - interval for gap in gaps]
+            lines.append(summarise("server overhead per token ms", overhead))
+
+    return lines
+
+
+class Command(BaseCommand):
+    help = "Opens concurrent LLM SSE streams against the app and reports latency."
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument("--url", default="http://127.0.0.1:8000")
+        parser.add_argument(
+            "--ollama-url",
+            default="http://127.0.0.1:11434",
+            help="A mockollama server, used to subtract the simulated model time.",
+        )
+        parser.add_argument("--target", choices=sorted(TARGETS), default="sse")
+        parser.add_argument("--streams", type=int, default=200)
+        parser.add_argument("--timeout", type=float, default=60.0)
+        parser.add_argument(
+            "--questions",
+            type=int,
+            default=1,
+            help="Questions asked by every customer_ai stream.",
+        )
+
+    def handle(self, *args: object, **options: t.Any) -> None:
+        for line in asyncio.run(run(options)):
+            self.stdout.write(line)
@@ -0,0 +1,261 @@
+import argparse
+import asyncio
+import dataclasses
+import datetime
+import json
+import random
+import typing as t
+
+from django.core.management.base import BaseCommand, CommandParser
+from django.utils import lorem_ipsum
+
+REASONS = {200: "OK", 404: "Not Found", 500: "Internal Server Error"}
+
+
+@dataclasses.dataclass(slots=True)
+class MockConfig:
+    ttft: float
+    token_rate: float
+    tokens: int
+    tool_call_rate: float
+    error_rate: float
+    drop_rate: float
+
+
+@dataclasses.dataclass(slots=True)
+class MockStats:
+    generations: int = 0
+    active: int = 0
+    completed: int = 0
+    cancelled: int = 0
+    errors: int = 0
+    dropped: int = 0
+
+
+def positive_int(value: str) -> int:
+    number = int(value)
+
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"{value} is not at least 1")
+
+    return number
+
+
+def positive_float(value: str) -> float:
+    number = float(value)
+
+    if number <= 0:
+        raise argparse.ArgumentTypeError(f"{value} is not above 0")
+
+    return number
+
+
+def now() -> str:
+    return datetime.datetime.now(datetime.UTC).isoformat()
+
+
+def mock_arguments(tool: dict[str, t.Any]) -> dict[str, t.Any]:
+    parameters = tool.get("function", {}).get("parameters", {})
+    properties = parameters.get("properties", {})
+    arguments = {}
+
+    for name in parameters.get("required", []) or list(properties)[:1]:
+        kind = properties.get(name, {}).get("type", "string")
+        arguments[name] = 1 if kind in ("int", "integer", "number") else "mock"
+
+    return arguments
+
+
+class MockOllama:
+    """Streams ``/api/chat`` responses the way Ollama does, without a model.
+
+    Every response waits ``ttft`` seconds before the first token and then
+    emits ``tokens`` tokens at ``token_rate`` tokens per second. A request
+    offering tools gets a tool call with probability ``tool_call_rate``.
+    Requests fail with a 500 with probability ``error_rate``, and streams
+    are cut off part way with probability ``drop_rate``. ``GET /api/mock``
+    returns the configuration and counters so benchmarks can subtract the
+    simulated model time.
+    """
+
+    def __init__(self, config: MockConfig) -> None:
+        self.config = config
+        self.stats = MockStats()
+        self._words = lorem_ipsum.words(1000, common=False).split()
+
+    async def handle(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        try:
+            while request_line := await reader.readline():
+                method, path, _ = request_line.decode().split(" ", 2)
+                headers = {}
+
+                while (line := await reader.readline()) not in (b"\r\n", b""):
+                    name, _, value = line.decode().partition(":")
+                    headers[name.strip().lower()] = value.strip()
+
+                body = await reader.readexactly(int(headers.get("content-length", 0)))
+                await self.route(method, path, body, writer)
+
+                if headers.get("connection", "").lower() == "close":
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def route(
+        self, method: str, path: str, body: bytes, writer: asyncio.StreamWriter
+    ) -> None:
+        if method == "POST" and path == "/api/chat":
+            await self.chat(json.loads(body or b"{}"), writer)
+        elif method == "GET" and path == "/api/mock":
+            data = {
+                "config": dataclasses.asdict(self.config),
+                "stats": dataclasses.asdict(self.stats),
+            }
+            await self.respond(writer, 200, data)
+        elif method == "GET" and path == "/api/version":
+            await self.respond(writer, 200, {"version": "0.0.0-mock"})
+        else:
+            await self.respond(writer, 404, {"error": f"{path} not found"})
+
+    async def respond(
+        self, writer: asyncio.StreamWriter, status: int, data: dict[str, t.Any]
+    ) -> None:
+        body = json.dumps(data).encode()
+        writer.write(
+            f"HTTP/1.1 {status} {REASONS[status]}\r\n"
+            "Content-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\n\r\n".encode()
+            + body
+        )
+        await writer.drain()
+
+    async def send_chunk(
+        self, writer: asyncio.StreamWriter, data: dict[str, t.Any]
+    ) -> None:
+        line = json.dumps(data).encode() + b"\n"
+        writer.write(b"%x\r\n%b\r\n" % (len(line), line))
+        await writer.drain()
+
+    def message(self, model: str, content: str, **extra: t.Any) -> dict[str, t.Any]:
+        return {
+            "model": model,
+            "created_at": now(),
+            "message": {"role": "assistant", "content": content, **extra},
+            "done": False,
+        }
+
+    async def chat(
+        self, payload: dict[str, t.Any], writer: asyncio.StreamWriter
+    ) -> None:
+        config = self.config
+        model = payload.get("model", "mock")
+
+        if random.random() < config.error_rate:
+            self.stats.errors += 1
+            await self.respond(writer, 500, {"error": "mock failure"})
+            return
+
+        self.stats.generations += 1
+        self.stats.active += 1
+        loop = asyncio.get_running_loop()
+        started_at = loop.time()
+        drop_after = (
+            random.randrange(config.tokens)
+            if random.random() < config.drop_rate
+            else -1
+        )
+
+        try:
+            writer.write(
+                b"HTTP/1.1 200 OK\r\n"
+                b"Content-Type: application/x-ndjson\r\n"
+                b"Transfer-Encoding: chunked\r\n\r\n"
+            )
+
+            for index in range(config.tokens):
+                # Tokens follow a fixed schedule so slow writes do not drift.
+                due = started_at + config.ttft + index / config.token_rate
+                await asyncio.sleep(max(0.0, due - loop.time()))
+
+                if index == drop_after:
+                    self.stats.dropped += 1
+                    writer.transport.abort()
+                    return
+
+                word = random.choice(self._words)
+                await self.send_chunk(writer, self.message(model, f"{word} "))
+
+            tools = payload.get("tools") or []
+
+            if tools and random.random() < config.tool_call_rate:
+                tool = random.choice(tools)
+                tool_call = {
+                    "function": {
+                        "name": tool.get("function", {}).get("name", ""),
+                        "arguments": mock_arguments(tool),
+                    }
+                }
+                await self.send_chunk(
+                    writer, self.message(model, "", tool_calls=[tool_call])
+                )
+
+            duration = int((loop.time() - started_at) * 1e9)
+            await self.send_chunk(
+                writer,
+                {
+                    **self.message(model, ""),
+                    "done": True,
+                    "done_reason": "stop",
+                    "total_duration": duration,
+                    "eval_count": config.tokens,
+                    "eval_duration": duration,
+                },
+            )
+            writer.write(b"0\r\n\r\n")
+            await writer.drain()
+            self.stats.completed += 1
+        except ConnectionError:
+            self.stats.cancelled += 1
+            raise
+        finally:
+            self.stats.active -= 1
+
+
+async def serve(host: str, port: int, config: MockConfig) -> None:
+    mock = MockOllama(config)
+    server = await asyncio.start_server(mock.handle, host, port)
+    print(f"Mock Ollama listening on http://{host}:{port}", config)
+
+    async with server:
+        await server.serve_forever()
+
+
+class Command(BaseCommand):
+    help = "Mock Ollama chat server for load tests, no model required."
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument("--host", default="127.0.0.1")
+        parser.add_argument("--port", type=int, default=11434)
+        parser.add_argument("--ttft", type=float, default=0.2, help="Seconds.")
+        parser.add_argument(
+            "--token-rate", type=positive_float, default=50.0, help="Tokens per second."
+        )
+        parser.add_argument("--tokens", type=positive_int, default=100)
+        parser.add_argument("--tool-call-rate", type=float, default=1.0)
+        parser.add_argument("--error-rate", type=float, default=0.0)
+        parser.add_argument("--drop-rate", type=float, default=0.0)
+
+    def handle(self, *args: object, **options: t.Any) -> None:
+        config = MockConfig(
+            ttft=options["ttft"],
+            token_rate=options["token_rate"],
+            tokens=options["tokens"],
+            tool_call_rate=options["tool_call_rate"],
+            error_rate=options["error_rate"],
+            drop_rate=options["drop_rate"],
+        )
+        asyncio.run(serve(options["host"], options["port"], config))
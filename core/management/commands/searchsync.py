@@ -0,0 +1,19 @@
+import typing as t
+
+from django.core.management.base import BaseCommand
+
+from core import retrieval
+
+
+class Command(BaseCommand):
+    help = "Pushes every customer to the Meilisearch index."
+
+    def handle(self, *args: object, **options: t.Any) -> None:
+        retriever = retrieval.get_retriever()
+
+        if not isinstance(retriever, retrieval.MeilisearchRetriever):
+            print("MEILISEARCH_URL is not set, customers are searched in Postgres")
+            return
+
+        retriever.sync(full=True)
+        print("Customers pushed to Meilisearch")
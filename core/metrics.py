@@ -0,0 +1,236 @@
+import bisect
+import typing as t
+
+REGISTRY: dict[str, "Metric"] = {}
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+TOKEN_LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1)
+RATE_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+
+def format_labels(labels: dict[str, str]) -> str:
+    if not labels:
+        return ""
+
+    pairs = []
+
+    for name, value in labels.items():
+        value = value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        pairs.append(f'{name}="{value}"')
+
+    return "{" + ",".join(pairs) + "}"
+
+
+class CounterValue:
+    def __init__(self) -> None:
+        self.value = 0
+
+    def inc(self, amount: int = 1) -> None:
+        self.value += amount
+
+    def render(self, name: str, labels: dict[str, str]) -> t.Iterator[str]:
+        yield f"{name}{format_labels(labels)} {self.value}"
+
+
+class HistogramValue:
+    def __init__(self, buckets: tuple[float, ...]) -> None:
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+    def render(self, name: str, labels: dict[str, str]) -> t.Iterator[str]:
+        count = 0
+
+        for bound, bucket_count in zip(self.buckets, self.counts):
+            count += bucket_count
+            bucket_labels = format_labels({**labels, "le": f"{bound}"})
+            yield f"{name}_bucket{bucket_labels} {count}"
+
+        count += self.counts[-1]
+        yield f"{name}_bucket{format_labels({**labels, 'le': '+Inf'})} {count}"
+        yield f"{name}_sum{format_labels(labels)} {self.sum}"
+        yield f"{name}_count{format_labels(labels)} {count}"
+
+
+class Metric:
+    """A metric of this worker process, one value per set of label values."""
+
+    type = ""
+
+    def __init__(
+        self, name: str, documentation: str, labelnames: tuple[str, ...] = ()
+    ) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._values: dict[tuple[str, ...], t.Any] = {}
+
+    def _new_value(self) -> t.Any:
+        raise NotImplementedError
+
+    def labels(self, **labels: str) -> t.Any:
+        key = tuple(labels[name] for name in self.labelnames)
+
+        if key not in self._values:
+            self._values[key] = self._new_value()
+
+        return self._values[key]
+
+    def render(self) -> t.Iterator[str]:
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} {self.type}"
+
+        for key, value in self._values.items():
+            yield from value.render(self.name, dict(zip(self.labelnames, key)))
+
+
+class Counter(Metric):
+    """A monotonically increasing value."""
+
+    type = "counter"
+
+    def __init__(
+        self, name: str, documentation: str, labelnames: tuple[str, ...] = ()
+    ) -> None:
+        super().__init__(name, documentation, labelnames)
+
+        if not labelnames:
+            self.labels()
+
+    def _new_value(self) -> CounterValue:
+        return CounterValue()
+
+    def labels(self, **labels: str) -> CounterValue:
+        return super().labels(**labels)
+
+    @property
+    def value(self) -> int:
+        return self.labels().value
+
+    def inc(self, amount: int = 1) -> None:
+        self.labels().inc(amount)
+
+
+class Histogram(Metric):
+    """Counts observations into cumulative buckets."""
+
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = LATENCY_BUCKETS,
+    ) -> None:
+        super().__init__(name, documentation, labelnames)
+        self.buckets = buckets
+
+    def _new_value(self) -> HistogramValue:
+        return HistogramValue(self.buckets)
+
+    def labels(self, **labels: str) -> HistogramValue:
+        return super().labels(**labels)
+
+
+class Collected(Metric):
+    """A value read from ``collect`` whenever the metrics are rendered."""
+
+    def __init__(
+        self, name: str, documentation: str, type: str, collect: t.Callable[[], float]
+    ) -> None:
+        super().__init__(name, documentation)
+        self.type = type
+        self.collect = collect
+
+    def render(self) -> t.Iterator[str]:
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} {self.type}"
+        yield f"{self.name} {self.collect()}"
+
+
+def counter(name: str, documentation: str, labelnames: tuple[str, ...] = ()) -> Counter:
+    if name not in REGISTRY:
+        REGISTRY[name] = Counter(name, documentation, labelnames)
+
+    return t.cast(Counter, REGISTRY[name])
+
+
+def histogram(
+    name: str,
+    documentation: str,
+    labelnames: tuple[str, ...] = (),
+    buckets: tuple[float, ...] = LATENCY_BUCKETS,
+) -> Histogram:
+    if name not in REGISTRY:
+        REGISTRY[name] = Histogram(name, documentation, labelnames, buckets)
+
+    return t.cast(Histogram, REGISTRY[name])
+
+
+def collected(
+    name: str, documentation: str, type: str, collect: t.Callable[[], float]
+) -> Collected:
+    if name not in REGISTRY:
+        REGISTRY[name] = Collected(name, documentation, type, collect)
+
+    return t.cast(Collected, REGISTRY[name])
+
+
+def render() -> str:
+    """All metrics in the Prometheus text exposition format."""
+    lines = []
+
+    for metric in REGISTRY.values():
+        lines.extend(metric.render())
+
+    return "\n".join(lines) + "\n"
+
+
+LLM_LABELS = ("model", "endpoint")
+LLM_GENERATIONS_SHARED = counter(
+    "llm_generations_shared_total",
+    "Chat requests which joined an identical generation in flight.",
+    LLM_LABELS,
+)
+LLM_QUEUE_WAIT = histogram(
+    "llm_queue_wait_seconds",
+    "Time waited for a generation slot.",
+    LLM_LABELS,
+)
+LLM_TIME_TO_FIRST_TOKEN = histogram(
+    "llm_time_to_first_token_seconds",
+    "Time from a request to its first token, including the queue wait.",
+    LLM_LABELS,
+)
+LLM_INTER_TOKEN_LATENCY = histogram(
+    "llm_inter_token_latency_seconds",
+    "Time between consecutive tokens of a generation.",
+    LLM_LABELS,
+    TOKEN_LATENCY_BUCKETS,
+)
+LLM_TOKENS_PER_SECOND = histogram(
+    "llm_tokens_per_second",
+    "Tokens per second of completed generations, after the first token.",
+    LLM_LABELS,
+    RATE_BUCKETS,
+)
+LLM_STREAMS_CANCELLED = counter(
+    "llm_streams_cancelled_total",
+    "Generations closed before the last token, as every client following them left.",
+    LLM_LABELS,
+)
+LLM_TOKENS_WASTED = counter(
+    "llm_tokens_wasted_total",
+    "Tokens streamed by generations which were cancelled.",
+    LLM_LABELS,
+)
+LLM_TOOL_CALLS = counter(
+    "llm_tool_calls_total",
+    "Tool calls returned by the model.",
+    (*LLM_LABELS, "function"),
+)
@@ -0,0 +1,251 @@
+import asyncio
+import contextlib
+import typing as t
+
+import nats
+import nats.aio.client
+import nats.aio.msg
+import nats.aio.subscription
+import nats.errors
+import nats.js
+from django.conf import settings
+
+from core import metrics, sse
+
+
+class NatsConnection:
+    """Process wide NATS connection, connected on first use.
+
+    Every request shares one connection, so publishing is a write into the
+    client's pending buffer which its flusher sends in batches, rather than
+    a connect, publish and leaked socket per request. Once connected the
+    client reconnects forever, buffering publishes meanwhile, whereas the
+    first connect gives up after ``connect_attempts`` so requests fail fast
+    while NATS is down. ``drain`` is called on ASGI shutdown so buffered
+    messages are flushed.
+    """
+
+    def __init__(
+        self, servers: list[str], name: str, connect_attempts: int = 2
+    ) -> None:
+        self.servers = servers
+        self.name = name
+        self.connect_attempts = connect_attempts
+        self.disconnects = 0
+        self.errors = 0
+        self._nc: nats.aio.client.Client | None = None
+        self._lock = asyncio.Lock()
+
+    async def _disconnected(self) -> None:
+        self.disconnects += 1
+        print("NATS disconnected", self.name)
+
+    async def _reconnected(self) -> None:
+        print("NATS reconnected", self.name, self._nc and self._nc.connected_url)
+
+    async def _error(self, ex: Exception) -> None:
+        self.errors += 1
+        print("NATS error", self.name, repr(ex))
+
+    async def connect(self) -> nats.aio.client.Client:
+        if self._nc is not None and not self._nc.is_closed:
+            return self._nc
+
+        async with self._lock:
+            if self._nc is None or self._nc.is_closed:
+                nc = await nats.connect(
+                    servers=self.servers,
+                    name=self.name,
+                    max_reconnect_attempts=self.connect_attempts,
+                    disconnected_cb=self._disconnected,
+                    reconnected_cb=self._reconnected,
+                    error_cb=self._error,
+                )
+                # The same option bounds the first connect, which should fail
+                # the request quickly, and reconnects, which should not give
+                # up while the server restarts.
+                nc.options["max_reconnect_attempts"] = -1
+                self._nc = nc
+
+        return self._nc
+
+    async def publish(self, subject: str, payload: bytes) -> None:
+        nc = await self.connect()
+        await nc.publish(subject, payload)
+
+    async def subscribe(
+        self,
+        subject: str,
+        cb: t.Callable[[nats.aio.msg.Msg], t.Awaitable[None]] | None = None,
+    ) -> nats.aio.subscription.Subscription:
+        """Subscribe, returning once the server has the subscription.
+
+        The flush round trips to the server, so anything published after
+        this returns, from any connection, reaches the subscription.
+        """
+        nc = await self.connect()
+        subscription = await nc.subscribe(subject, cb=cb)
+        await nc.flush()
+        return subscription
+
+    async def jetstream(self) -> nats.js.JetStreamContext:
+        nc = await self.connect()
+        return nc.jetstream()
+
+    async def drain(self) -> None:
+        """Flush pending messages and close, used on shutdown."""
+        nc, self._nc = self._nc, None
+
+        if nc is None or nc.is_closed:
+            return
+
+        if nc.is_connected:
+            await nc.drain()
+        else:
+            await nc.close()
+
+    @property
+    def is_connected(self) -> bool:
+        return self._nc is not None and self._nc.is_connected
+
+    def stats(self) -> dict[str, int]:
+        stats = dict(self._nc.stats) if self._nc is not None else {}
+        stats["connected"] = int(self.is_connected)
+        stats["disconnects"] = self.disconnects
+        stats["errors"] = self.errors
+        stats["pending_bytes"] = self._nc.pending_data_size if self._nc else 0
+        return stats
+
+
+async def unsubscribe(sub: nats.aio.subscription.Subscription) -> None:
+    """Unsubscribe unless the connection was already closed on shutdown."""
+    with contextlib.suppress(nats.errors.ConnectionClosedError):
+        await sub.unsubscribe()
+
+
+class Listener:
+    """The messages of a subject for one local consumer, decoded as text.
+
+    The queue is bounded; a consumer falling behind loses its oldest
+    messages rather than holding up the others.
+    """
+
+    def __init__(self, subject: str, maxsize: int) -> None:
+        self.subject = subject
+        self.queue: asyncio.Queue[str] = asyncio.Queue(maxsize)
+
+    def put(self, data: str) -> None:
+        if sse.put_latest(self.queue, data):
+            MESSAGES_DROPPED.inc()
+
+    def __aiter__(self) -> "Listener":
+        return self
+
+    async def __anext__(self) -> str:
+        return await self.queue.get()
+
+
+class Multiplexer:
+    """Fans the messages of a subject out to every local listener.
+
+    Each subject has a single NATS subscription per process however many
+    clients listen, so a message crosses the network and is decoded once per
+    worker. The subscription is made for the first listener and dropped when
+    the last one leaves.
+    """
+
+    def __init__(self, connection: NatsConnection, queue_size: int = 100) -> None:
+        self.connection = connection
+        self.queue_size = queue_size
+        self._listeners: dict[str, set[Listener]] = {}
+        self._subscriptions: dict[
+            str, asyncio.Task[nats.aio.subscription.Subscription]
+        ] = {}
+
+    async def _subscribe(self, subject: str) -> nats.aio.subscription.Subscription:
+        async def deliver(message: nats.aio.msg.Msg) -> None:
+            data = message.data.decode()
+
+            for listener in self._listeners.get(subject, ()):
+                listener.put(data)
+
+        return await self.connection.subscribe(subject, cb=deliver)
+
+    @contextlib.asynccontextmanager
+    async def listen(self, subject: str) -> t.AsyncIterator[Listener]:
+        listener = Listener(subject, self.queue_size)
+        listeners = self._listeners.setdefault(subject, set())
+        listeners.add(listener)
+
+        if subject not in self._subscriptions:
+            self._subscriptions[subject] = asyncio.create_task(self._subscribe(subject))
+
+        task = self._subscriptions[subject]
+
+        try:
+            # Shielded as the task is shared by every listener of the subject.
+            await asyncio.shield(task)
+            yield listener
+        finally:
+            listeners.discard(listener)
+
+            if not listeners and self._listeners.get(subject) is listeners:
+                del self._listeners[subject]
+                del self._subscriptions[subject]
+
+                if not task.done():
+                    task.cancel()
+                elif not task.cancelled() and task.exception() is None:
+                    await unsubscribe(task.result())
+
+    @property
+    def subjects(self) -> dict[str, int]:
+        return {
+            subject: len(listeners) for subject, listeners in self._listeners.items()
+        }
+
+
+def stat(name: str) -> t.Callable[[], int]:
+    return lambda: connection.stats().get(name, 0)
+
+
+connection = NatsConnection(servers=settings.NATS_SERVERS, name=settings.NATS_NAME)
+multiplexer = Multiplexer(connection)
+
+MESSAGES_DROPPED = metrics.counter(
+    "nats_listener_messages_dropped_total",
+    "Messages dropped as a local listener's queue was full.",
+)
+
+metrics.collected(
+    "nats_connected", "Whether the NATS connection is up.", "gauge", stat("connected")
+)
+metrics.collected(
+    "nats_pending_bytes",
+    "Bytes buffered for NATS, waiting to be flushed.",
+    "gauge",
+    stat("pending_bytes"),
+)
+metrics.collected(
+    "nats_subscriptions",
+    "Subjects subscribed to by the multiplexer.",
+    "gauge",
+    lambda: len(multiplexer.subjects),
+)
+metrics.collected(
+    "nats_listeners",
+    "Local listeners of the multiplexer's subjects.",
+    "gauge",
+    lambda: sum(multiplexer.subjects.values()),
+)
+
+for name, documentation in (
+    ("in_msgs", "Messages received from NATS."),
+    ("out_msgs", "Messages published to NATS."),
+    ("in_bytes", "Bytes received from NATS."),
+    ("out_bytes", "Bytes published to NATS."),
+    ("reconnects", "Reconnections to NATS."),
+    ("disconnects", "Disconnections from NATS."),
+    ("errors", "NATS connection errors."),
+):
+    metrics.collected(f"nats_{name}_total", documentation, "counter", stat(name))
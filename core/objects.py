@@ -0,0 +1,258 @@
+import base64
+import contextlib
+import dataclasses
+import hashlib
+import io
+import json
+import re
+import typing as t
+import uuid
+
+import nats.errors
+import nats.js.api
+import nats.js.errors
+import nats.js.kv
+import nats.js.object_store
+from django.http import HttpRequest
+
+from core import metrics, natsconn
+
+BUCKET = "stuff"
+STREAM = nats.js.object_store.OBJ_STREAM_TEMPLATE.format(bucket=BUCKET)
+INDEX_BUCKET = f"{BUCKET}-index"
+DIGEST_HEADER = "X-Content-SHA256"
+EMPTY_DIGEST = hashlib.sha256().hexdigest()
+
+UPLOADS_DEDUPLICATED = metrics.counter(
+    "object_uploads_deduplicated_total",
+    "Uploads whose content was already stored.",
+)
+BYTES_DEDUPLICATED = metrics.counter(
+    "object_bytes_deduplicated_total",
+    "Bytes not stored again as the content was already stored.",
+)
+BODIES_SKIPPED = metrics.counter(
+    "object_upload_bodies_skipped_total",
+    "Uploads answered from the digest header without reading the body.",
+)
+
+
+class DigestMismatch(Exception):
+    """Raised when an upload does not match the digest it was sent with."""
+
+
+@dataclasses.dataclass(slots=True, frozen=True)
+class Entry:
+    name: str
+    object: str
+    digest: str
+    size: int
+
+
+class RequestReader(io.RawIOBase):
+    """The request body as a raw file, read one chunk at a time.
+
+    ``ObjectStore.put`` calls ``readinto`` from an executor with a buffer
+    of one chunk, so only that chunk of the body is ever held in memory.
+    """
+
+    def __init__(self, request: HttpRequest) -> None:
+        self.request = request
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer: t.Any) -> int:
+        data = self.request.read(len(buffer))
+        buffer[: len(data)] = data
+        return len(data)
+
+
+async def get_store() -> nats.js.object_store.ObjectStore:
+    js = await natsconn.connection.jetstream()
+
+    try:
+        return await js.object_store(BUCKET)
+    except nats.js.errors.BucketNotFoundError:
+        return await js.create_object_store(BUCKET)
+
+
+async def upload(
+    store: nats.js.object_store.ObjectStore, name: str, request: HttpRequest
+) -> nats.js.api.ObjectInfo:
+    return await store.put(name, RequestReader(request))
+
+
+async def get_index() -> nats.js.kv.KeyValue:
+    js = await natsconn.connection.jetstream()
+
+    try:
+        return await js.key_value(INDEX_BUCKET)
+    except nats.js.errors.BucketNotFoundError:
+        return await js.create_key_value(bucket=INDEX_BUCKET)
+
+
+def name_key(name: str) -> str:
+    return "names." + base64.urlsafe_b64encode(name.encode()).decode()
+
+
+def digest_key(digest: str) -> str:
+    return f"digests.{digest}"
+
+
+async def _get_json(index: nats.js.kv.KeyValue, key: str) -> dict[str, t.Any] | None:
+    try:
+        entry = await index.get(key)
+    except nats.js.errors.NotFoundError:
+        return None
+
+    return json.loads(entry.value) if entry.value else None
+
+
+async def lookup(name: str) -> Entry | None:
+    index = await get_index()
+    value = await _get_json(index, name_key(name))
+    return Entry(name=name, **value) if value else None
+
+
+async def list_entries() -> list[Entry]:
+    index = await get_index()
+
+    try:
+        keys = await index.keys(filters=["names.>"])
+    except nats.js.errors.NoKeysError:
+        return []
+
+    entries = []
+
+    for key in keys:
+        value = await _get_json(index, key)
+
+        if value:
+            name = base64.urlsafe_b64decode(key.removeprefix("names.")).decode()
+            entries.append(Entry(name=name, **value))
+
+    return sorted(entries, key=lambda entry: entry.name)
+
+
+async def _link(
+    index: nats.js.kv.KeyValue, name: str, content: dict[str, t.Any]
+) -> Entry:
+    await index.put(name_key(name), json.dumps(content).encode())
+    return Entry(name=name, **content)
+
+
+async def put(
+    object_store: nats.js.object_store.ObjectStore,
+    name: str,
+    request: HttpRequest,
+    digest: str = "",
+) -> tuple[Entry | None, bool]:
+    """Stores the request body under ``name`` unless its content is stored.
+
+    Content is kept once per sha256 digest, as an object with a name of its
+    own, and ``name`` is pointed at it in the index. When the client sends
+    ``digest`` and that content is already stored the body is never read.
+    An empty body with an unknown ``digest`` asks whether the content is
+    stored, so a client can skip sending it, and gives ``None``. Otherwise
+    the body is streamed into a new object, hashed on the way, and the
+    object is dropped again if another upload stored the same content
+    meanwhile. Returns the entry and whether its content was already
+    stored.
+
+    Pointing ``name`` at other content leaves the previous object in the
+    store, as other names may share it and nothing counts them; it is not
+    collected.
+    """
+    index = await get_index()
+    digest = digest.lower()
+
+    if digest and not re.fullmatch(r"[0-9a-f]{64}", digest):
+        raise DigestMismatch(f"{DIGEST_HEADER} must be a hex encoded sha256 digest.")
+
+    if digest:
+        content = await _get_json(index, digest_key(digest))
+
+        if content is not None:
+            BODIES_SKIPPED.inc()
+            UPLOADS_DEDUPLICATED.inc()
+            BYTES_DEDUPLICATED.inc(content["size"])
+            return await _link(index, name, content), True
+
+        if request.headers.get("Content-Length") == "0" and digest != EMPTY_DIGEST:
+            return None, False
+
+    info = await upload(object_store, f"blobs/{uuid.uuid4().hex}", request)
+    actual = get_digest(info).hex()
+
+    if digest and digest != actual:
+        await object_store.delete(info.name)
+        raise DigestMismatch(f"Expected {digest}, received {actual}.")
+
+    content = {"object": info.name, "digest": actual, "size": info.size}
+
+    try:
+        await index.create(digest_key(actual), json.dumps(content).encode())
+    except nats.js.errors.KeyWrongLastSequenceError:
+        # Stored already, by an upload without a digest or a concurrent one.
+        await object_store.delete(info.name)
+        content = await _get_json(index, digest_key(actual)) or content
+        UPLOADS_DEDUPLICATED.inc()
+        BYTES_DEDUPLICATED.inc(info.size)
+        return await _link(index, name, content), True
+
+    return await _link(index, name, content), False
+
+
+def get_digest(info: nats.js.api.ObjectInfo) -> bytes:
+    digest = info.digest.removeprefix(nats.js.object_store.OBJ_DIGEST_TYPE)
+    return base64.urlsafe_b64decode(digest)
+
+
+async def download(
+    info: nats.js.api.ObjectInfo, prefetch: int = 4, timeout: float = 5.0
+) -> t.AsyncIterator[bytes]:
+    """The chunks of an object, in order, as they are read from the stream.
+
+    Chunks are pulled ``prefetch`` at a time by an ephemeral consumer, and
+    the next batch is only fetched once the response took the previous
+    one, so a slow client holds at most one batch in memory whatever the
+    size of the object. ``ObjectStore.get`` would buffer it whole.
+    """
+    if not info.chunks:
+        return
+
+    js = await natsconn.connection.jetstream()
+    subject = nats.js.object_store.OBJ_CHUNKS_PRE_TEMPLATE.format(
+        bucket=info.bucket, obj=info.nuid
+    )
+    subscription = await js.pull_subscribe(
+        subject,
+        stream=STREAM,
+        config=nats.js.api.ConsumerConfig(
+            ack_policy=nats.js.api.AckPolicy.NONE,
+            inactive_threshold=timeout * 4,
+            mem_storage=True,
+            num_replicas=1,
+        ),
+    )
+    consumer = (await subscription.consumer_info()).name
+    digest = hashlib.sha256()
+    remaining = info.chunks
+
+    try:
+        while remaining:
+            messages = await subscription.fetch(min(prefetch, remaining), timeout)
+
+            for message in messages:
+                remaining -= 1
+                digest.update(message.data)
+                yield message.data
+
+        # The body was already sent, so a mismatch can only be logged.
+        if digest.digest() != get_digest(info):
+            print("Object digest mismatch", info.name)
+    finally:
+        with contextlib.suppress(nats.errors.Error):
+            await subscription.unsubscribe()
+            await js.delete_consumer(STREAM, consumer)
@@ -0,0 +1,81 @@
+import collections
+import textwrap
+
+from core import retrieval
+from db import models as db_models
+
+# Everything before the customers never changes, so Ollama can reuse the
+# cached prompt prefix across questions.
+CUSTOMER_SYSTEM_PROMPT_PREFIX = textwrap.dedent("""\
+    You are an assistant which provides tool calls based on user queries.
+
+    The user queries relate to calling actions which create, update or view a customer.
+    The available customers you can use for the view function are as follows.
+
+    ===Context===
+    """)
+CUSTOMER_SYSTEM_PROMPT_SUFFIX = "===Context===\n"
+
+
+def render_customer(customer: db_models.Customer) -> str:
+    return textwrap.dedent(f"""\
+        <Customer>
+            customer_id {customer.pk}
+            Name to ID Mapping {customer.name} = {customer.pk}
+            ID to Name Mapping {customer.pk} = {customer.name}
+        </Customer>
+
+        """)
+
+
+class CustomerContext:
+    """Builds the customer context from the customers relevant to a question.
+
+    Only ``k`` customers go into the prompt, so its size does not depend on
+    the number of customers. Customers mentioned by id always come first,
+    as ids are neither words nor part of the search, and the retriever
+    fills the remaining places. Rendered fragments are cached by
+    ``(pk, version)``, the versioning trigger bumps the version on every
+    update, and fragments are ordered by primary key so the same customers
+    always give the same prompt.
+    """
+
+    def __init__(self, retriever: retrieval.Retriever, k: int, maxsize: int = 4096):
+        self.retriever = retriever
+        self.k = k
+        self._maxsize = maxsize
+        self._fragments: collections.OrderedDict[tuple[int, int], str] = (
+            collections.OrderedDict()
+        )
+
+    def _render(self, customer: db_models.Customer) -> str:
+        key = (customer.pk, customer.version)
+        fragment = self._fragments.get(key)
+
+        if fragment is None:
+            fragment = self._fragments[key] = render_customer(customer)
+
+            if len(self._fragments) > self._maxsize:
+                self._fragments.popitem(last=False)
+        else:
+            self._fragments.move_to_end(key)
+
+        return fragment
+
+    def build(self, question: str) -> tuple[str, dict[int, db_models.Customer]]:
+        """The system prompt for ``question`` and the customers it mentions."""
+        customers = {
+            customer.pk: customer for customer in retrieval.get_mentioned(question)
+        }
+
+        for customer in self.retriever.retrieve(question, self.k):
+            customers.setdefault(customer.pk, customer)
+
+        customers = dict(list(customers.items())[: self.k])
+        fragments = [self._render(customers[pk]) for pk in sorted(customers)]
+        system_prompt = (
+            CUSTOMER_SYSTEM_PROMPT_PREFIX
+            + "".join(fragments)
+            + CUSTOMER_SYSTEM_PROMPT_SUFFIX
+        )
+        return system_prompt, customers
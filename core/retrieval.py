@@ -0,0 +1,205 @@
+import datetime
+import functools
+import operator
+import re
+import time
+import typing as t
+
+import meilisearch
+import meilisearch.errors
+from django.conf import settings
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.utils import timezone
+
+from db import models as db_models
+
+MAX_QUERY_WORDS = 32
+MIN_WORD_LENGTH = 3
+# Words of questions rather than of names and addresses. As prefixes they
+# match nearly every customer, so ranking would read the whole table.
+STOPWORDS = frozenset(
+    """
+    about address all and any are can create customer customers delete
+    did does find for from give has have her his how list lives living
+    many name named names not please show that the their them there they
+    this update view was what when where which who whom whose why will
+    with you your
+    """.split()
+)
+
+
+class Retriever(t.Protocol):
+    def retrieve(self, question: str, k: int) -> list[db_models.Customer]: ...
+
+
+def get_words(question: str) -> list[str]:
+    words = re.findall(r"\w+", question.lower())
+    return [
+        word for word in words if len(word) >= MIN_WORD_LENGTH and word not in STOPWORDS
+    ][:MAX_QUERY_WORDS]
+
+
+def get_ids(question: str) -> list[int]:
+    """Numbers in the question, which may be customer ids."""
+    return [int(number) for number in re.findall(r"\b\d+\b", question)][
+        :MAX_QUERY_WORDS
+    ]
+
+
+def get_mentioned(question: str) -> list[db_models.Customer]:
+    """The customers whose ids the question mentions."""
+    ids = get_ids(question)
+
+    if not ids:
+        return []
+
+    customers = db_models.Customer.objects.in_bulk(ids)
+    return [customers[pk] for pk in dict.fromkeys(ids) if pk in customers]
+
+
+class SearchRetriever:
+    """Ranks customers with Postgres full text search over name and address.
+
+    Every word of the question but ``STOPWORDS`` is matched as a prefix,
+    any word matching is enough, and the matches are ranked with
+    ``ts_rank``. The match uses the GIN index on ``CUSTOMER_SEARCH_VECTOR``
+    so only matching rows are read. Without any match the newest customers
+    are used.
+    """
+
+    def retrieve(self, question: str, k: int) -> list[db_models.Customer]:
+        words = get_words(question)
+        customers = db_models.Customer.objects.all()
+
+        if not words:
+            return list(customers.order_by("-pk")[:k])
+
+        query = functools.reduce(
+            operator.or_,
+            (
+                SearchQuery(f"{word}:*", config="simple", search_type="raw")
+                for word in words
+            ),
+        )
+        matches = (
+            customers.alias(search=db_models.CUSTOMER_SEARCH_VECTOR)
+            .filter(search=query)
+            .annotate(rank=SearchRank(db_models.CUSTOMER_SEARCH_VECTOR, query))
+            .order_by("-rank", "pk")[:k]
+        )
+        return list(matches) or list(customers.order_by("-pk")[:k])
+
+
+class MeilisearchRetriever:
+    """Ranks customers with Meilisearch and loads the matches from Postgres.
+
+    The whole table is pushed by ``manage.py searchsync``, never by a
+    question. From then on questions keep the index up to date
+    incrementally, at most every ``sync_interval`` seconds, starting from
+    when the process started. Customers whose ``sys_period`` started after
+    the last sync are added again, and customers whose history row was
+    closed since then and which no longer exist are removed. The watermark
+    trails by ``sync_overlap`` so transactions committed late are not
+    missed; adding a customer twice is harmless. Any Meilisearch failure
+    falls back to ``fallback``.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        api_key: str,
+        index: str,
+        fallback: Retriever,
+        sync_interval: float = 5.0,
+        sync_overlap: datetime.timedelta = datetime.timedelta(seconds=5),
+        batch_size: int = 1000,
+    ) -> None:
+        self._index = meilisearch.Client(url, api_key or None).index(index)
+        self.fallback = fallback
+        self.sync_interval = sync_interval
+        self.sync_overlap = sync_overlap
+        self.batch_size = batch_size
+        self._synced_at: datetime.datetime | None = timezone.now()
+        self._next_sync = 0.0
+
+    def _sync(self) -> None:
+        if time.monotonic() < self._next_sync:
+            return
+
+        self.sync()
+
+    def sync(self, full: bool = False) -> None:
+        """Pushes changed customers to the index, or every customer if ``full``."""
+        if full:
+            self._synced_at = None
+
+        customers = db_models.Customer.objects.all()
+        history = db_models.CustomerHistory.objects.all()
+
+        if self._synced_at is not None:
+            since = self._synced_at - self.sync_overlap
+            customers = customers.filter(sys_period__startswith__gt=since)
+            history = history.filter(sys_period__endswith__gt=since)
+        else:
+            history = history.none()
+
+        synced_at = self._synced_at
+        batch = []
+
+        for customer in customers.order_by("pk").iterator(chunk_size=self.batch_size):
+            batch.append(
+                {"id": customer.pk, "name": customer.name, "address": customer.address}
+            )
+            started_at = customer.sys_period.lower
+
+            if synced_at is None or started_at > synced_at:
+                synced_at = started_at
+
+            if len(batch) == self.batch_size:
+                self._index.add_documents(batch, primary_key="id")
+                batch = []
+
+        if batch:
+            self._index.add_documents(batch, primary_key="id")
+
+        closed = set(history.values_list("id", flat=True))
+        existing = db_models.Customer.objects.filter(pk__in=closed).values_list(
+            "pk", flat=True
+        )
+        deleted = closed.difference(existing)
+
+        if deleted:
+            self._index.delete_documents(sorted(deleted))
+
+        self._synced_at = synced_at
+        self._next_sync = time.monotonic() + self.sync_interval
+
+    def retrieve(self, question: str, k: int) -> list[db_models.Customer]:
+        try:
+            self._sync()
+            result = self._index.search(
+                question, {"limit": k, "attributesToRetrieve": ["id"]}
+            )
+        except (meilisearch.errors.MeilisearchError, OSError) as ex:
+            print("Meilisearch retrieval failed", repr(ex))
+            return self.fallback.retrieve(question, k)
+
+        ranks = {hit["id"]: rank for rank, hit in enumerate(result["hits"])}
+
+        if not ranks:
+            return self.fallback.retrieve(question, k)
+
+        customers = db_models.Customer.objects.filter(pk__in=ranks)
+        return sorted(customers, key=lambda customer: ranks[customer.pk])
+
+
+def get_retriever() -> Retriever:
+    if settings.MEILISEARCH_URL:
+        return MeilisearchRetriever(
+            settings.MEILISEARCH_URL,
+            settings.MEILISEARCH_API_KEY,
+            settings.MEILISEARCH_INDEX,
+            fallback=SearchRetriever(),
+        )
+
+    return SearchRetriever()
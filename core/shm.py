@@ -0,0 +1,121 @@
+import asyncio
+import fcntl
+import os
+import pathlib
+import tempfile
+import typing as t
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+
+PREFIX = "simp"
+
+
+class FileLock:
+    """An exclusive ``flock`` shared by every process on the host.
+
+    The lock is released by the kernel when the holding process exits, so a
+    crashed worker never leaves it held. ``async with`` polls for the lock
+    every ``poll_interval`` seconds rather than blocking the event loop.
+    """
+
+    poll_interval = 0.001
+
+    def __init__(self, name: str) -> None:
+        self.path = pathlib.Path(tempfile.gettempdir()) / f"{PREFIX}-{name}.lock"
+        self._fd: int | None = None
+
+    def _open(self) -> int:
+        if self._fd is None:
+            self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+
+        return self._fd
+
+    def acquire(self, blocking: bool = True) -> bool:
+        flags = fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB
+
+        try:
+            fcntl.flock(self._open(), flags)
+        except BlockingIOError:
+            return False
+
+        return True
+
+    def release(self) -> None:
+        if self._fd is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    def __enter__(self) -> t.Self:
+        self.acquire()
+        return self
+
+    def __exit__(self, *args: t.Any) -> None:
+        self.release()
+
+    async def __aenter__(self) -> t.Self:
+        while not self.acquire(blocking=False):
+            await asyncio.sleep(self.poll_interval)
+
+        return self
+
+    async def __aexit__(self, *args: t.Any) -> None:
+        self.release()
+
+
+def open_segment(name: str, size: int) -> shared_memory.SharedMemory:
+    """Create the named segment, or attach to it if another process did.
+
+    Worker processes come and go while the server runs, so the segment is
+    not owned by any of them and is left in place when they exit. A new
+    segment is zero filled.
+    """
+    with FileLock(f"{name}.create"):
+        try:
+            segment = shared_memory.SharedMemory(
+                name=f"{PREFIX}-{name}", create=True, size=size
+            )
+        except FileExistsError:
+            segment = shared_memory.SharedMemory(name=f"{PREFIX}-{name}")
+
+    resource_tracker.unregister(segment._name, "shared_memory")  # type: ignore[attr-defined]
+
+    if segment.size < size:
+        raise ValueError(f"Shared memory segment {name} is smaller than {size}")
+
+    return segment
+
+
+class SharedCounter:
+    """A counter incremented by every worker process on the host."""
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self._lock = FileLock(name)
+        self._segment: shared_memory.SharedMemory | None = None
+        self._value: np.ndarray | None = None
+
+    def _attach(self) -> np.ndarray:
+        if self._value is None:
+            self._segment = open_segment(self.name, 8)
+            self._value = np.ndarray((1,), dtype=np.int64, buffer=self._segment.buf)
+
+        return self._value
+
+    @property
+    def value(self) -> int:
+        return int(self._attach()[0])
+
+    def increment(self) -> int:
+        value = self._attach()
+
+        with self._lock:
+            value[0] += 1
+            return int(value[0])
+
+    async def aincrement(self) -> int:
+        """``increment`` without blocking the event loop on the lock."""
+        value = self._attach()
+
+        async with self._lock:
+            value[0] += 1
+            return int(value[0])
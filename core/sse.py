@@ -0,0 +1,338 @@
+import asyncio
+import collections
+import contextlib
+import dataclasses
+import typing as t
+import uuid
+
+from django.conf import settings
+from django.http import HttpRequest, StreamingHttpResponse
+
+RESET_EVENT = "reset"
+
+_DONE = object()
+
+T = t.TypeVar("T")
+
+
+def put_latest(queue: asyncio.Queue[T], item: T) -> bool:
+    """Put ``item``, dropping the oldest item if ``queue`` is full.
+
+    Slow consumers lose their oldest items rather than holding up everybody
+    else. Returns whether an item was dropped.
+    """
+    is_full = queue.full()
+
+    if is_full:
+        queue.get_nowait()
+
+    queue.put_nowait(item)
+    return is_full
+
+
+@dataclasses.dataclass(slots=True, frozen=True)
+class Event:
+    id: str
+    event: str
+    data: str
+
+
+def encode_lines(event: str, lines: t.Iterable[str], id: str = "") -> bytes:
+    """Encode a complete event, one ``data:`` field per line."""
+    parts = []
+
+    if id:
+        parts.append(f"id: {id}\n")
+
+    parts.append(f"event: {event}\n")
+
+    for line in lines:
+        parts.append(f"data: {line}\n")
+
+    parts.append("\n")
+    return "".join(parts).encode()
+
+
+def encode(event: str, data: str = "", id: str = "") -> bytes:
+    return encode_lines(event, data.split("\n"), id=id)
+
+
+def encode_event(item: Event) -> bytes:
+    return encode(item.event, item.data, id=item.id)
+
+
+def get_last_event_id(request: HttpRequest) -> str:
+    return request.headers.get("Last-Event-ID", "")
+
+
+class EventBuffer:
+    """Bounded ring buffer of recent events with monotonically increasing ids.
+
+    Event ids are rendered as ``<epoch>-<sequence>``. The epoch is unique to
+    the buffer so ids handed out by another worker, or by this worker before
+    a restart, are recognised as unknown rather than compared numerically.
+    """
+
+    def __init__(self, maxlen: int = 256, epoch: str = "") -> None:
+        self.epoch = epoch or uuid.uuid4().hex[:8]
+        self._events: collections.deque[tuple[int, Event]] = collections.deque(
+            maxlen=maxlen
+        )
+        self._sequence = 0
+
+    @property
+    def last_id(self) -> str:
+        return f"{self.epoch}-{self._sequence}"
+
+    def append(self, event: str, data: str) -> Event:
+        self._sequence += 1
+        item = Event(id=self.last_id, event=event, data=data)
+        self._events.append((self._sequence, item))
+        return item
+
+    def _parse_sequence(self, last_event_id: str) -> int | None:
+        epoch, _, sequence = last_event_id.rpartition("-")
+
+        if epoch != self.epoch or not sequence.isdigit():
+            return None
+
+        return int(sequence)
+
+    def since(self, last_event_id: str) -> list[Event] | None:
+        """Events after ``last_event_id`` or ``None`` if they are gone."""
+        sequence = self._parse_sequence(last_event_id)
+
+        if sequence is None or sequence > self._sequence:
+            return None
+
+        oldest = self._events[0][0] if self._events else self._sequence + 1
+
+        if sequence < oldest - 1:
+            return None
+
+        return [
+            item for item_sequence, item in self._events if item_sequence > sequence
+        ]
+
+
+@dataclasses.dataclass(slots=True)
+class Subscription:
+    backlog: list[Event]
+    queue: asyncio.Queue[Event | Exception]
+
+
+class EventChannel:
+    """Publishes events to every subscriber and remembers recent ones.
+
+    An optional ``source`` coroutine is started when the first subscriber
+    arrives and cancelled when the last one leaves. It is expected to call
+    ``publish`` for every upstream message, so each message is recorded once
+    per process regardless of how many clients are listening. If the source
+    fails its error is logged and delivered to every subscriber, and the
+    next subscriber starts it again.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        source: t.Callable[["EventChannel"], t.Awaitable[None]] | None = None,
+        maxlen: int = 256,
+        queue_size: int = 100,
+    ) -> None:
+        self.name = name
+        self._source = source
+        self._buffer = EventBuffer(maxlen=maxlen)
+        self._queue_size = queue_size
+        self._subscribers: set[asyncio.Queue[Event | Exception]] = set()
+        self._task: asyncio.Task | None = None
+
+    def _source_done(self, task: asyncio.Task) -> None:
+        if task.cancelled() or task.exception() is None:
+            return
+
+        ex = task.exception()
+        print("Event source failed", self.name, repr(ex))
+
+        for queue in self._subscribers:
+            put_latest(queue, ex)
+
+    def publish(self, event: str, data: str) -> Event:
+        item = self._buffer.append(event, data)
+
+        for queue in self._subscribers:
+            put_latest(queue, item)
+
+        return item
+
+    def _reset_event(self) -> Event:
+        return Event(id=self._buffer.last_id, event=RESET_EVENT, data="")
+
+    @contextlib.asynccontextmanager
+    async def subscribe(self, last_event_id: str = "") -> t.AsyncIterator[Subscription]:
+        if not last_event_id:
+            backlog = []
+        else:
+            backlog = self._buffer.since(last_event_id)
+
+            if backlog is None:
+                backlog = [self._reset_event()]
+
+        queue: asyncio.Queue[Event | Exception] = asyncio.Queue(self._queue_size)
+        self._subscribers.add(queue)
+
+        if self._source and (self._task is None or self._task.done()):
+            self._task = asyncio.create_task(self._source(self))
+            self._task.add_done_callback(self._source_done)
+
+        try:
+            yield Subscription(backlog=backlog, queue=queue)
+        finally:
+            self._subscribers.discard(queue)
+
+            if not self._subscribers and self._task:
+                self._task.cancel()
+                self._task = None
+
+
+async def channel_events(
+    channel: EventChannel, last_event_id: str = ""
+) -> t.AsyncIterator[Event]:
+    async with channel.subscribe(last_event_id) as subscription:
+        for item in subscription.backlog:
+            yield item
+
+        while True:
+            item = await subscription.queue.get()
+
+            # The stream fails with the source rather than going quiet.
+            if isinstance(item, Exception):
+                raise item
+
+            yield item
+
+
+class StreamBuffers:
+    """Keeps the buffers of recent one-shot streams for resuming clients."""
+
+    def __init__(self, maxsize: int = 128, maxlen: int = 1024) -> None:
+        self._maxsize = maxsize
+        self._maxlen = maxlen
+        self._buffers: collections.OrderedDict[str, EventBuffer] = (
+            collections.OrderedDict()
+        )
+        self._complete: set[str] = set()
+
+    def new(self) -> EventBuffer:
+        buffer = EventBuffer(maxlen=self._maxlen)
+        self._buffers[buffer.epoch] = buffer
+
+        while len(self._buffers) > self._maxsize:
+            epoch, _ = self._buffers.popitem(last=False)
+            self._complete.discard(epoch)
+
+        return buffer
+
+    def get(self, last_event_id: str) -> EventBuffer | None:
+        epoch, _, _ = last_event_id.rpartition("-")
+        return self._buffers.get(epoch)
+
+    def mark_complete(self, buffer: EventBuffer) -> None:
+        self._complete.add(buffer.epoch)
+
+    def is_complete(self, buffer: EventBuffer) -> bool:
+        return buffer.epoch in self._complete
+
+
+async def coalesce(
+    events: t.AsyncIterator[bytes], window: float, max_events: int
+) -> t.AsyncIterator[bytes]:
+    """Join the events produced within ``window`` seconds into one chunk.
+
+    The source is driven by a separate task so a slow source never delays a
+    chunk that is ready. At most ``max_events`` events are joined, after
+    which the chunk is flushed regardless of the window.
+    """
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue[t.Any] = asyncio.Queue(max_events)
+
+    async def pump() -> None:
+        try:
+            async for chunk in events:
+                await queue.put(chunk)
+        except Exception as ex:
+            await queue.put(ex)
+        else:
+            await queue.put(_DONE)
+        finally:
+            aclose = getattr(events, "aclose", None)
+
+            if aclose:
+                await aclose()
+
+    task = asyncio.create_task(pump())
+    is_done = False
+
+    try:
+        while not is_done:
+            item = await queue.get()
+
+            if item is _DONE:
+                break
+
+            if isinstance(item, Exception):
+                raise item
+
+            batch = [item]
+            deadline = loop.time() + window
+
+            while len(batch) < max_events:
+                try:
+                    if queue.empty():
+                        timeout = deadline - loop.time()
+
+                        if timeout <= 0:
+                            break
+
+                        item = await asyncio.wait_for(queue.get(), timeout)
+                    else:
+                        item = queue.get_nowait()
+                except TimeoutError:
+                    break
+
+                if item is _DONE:
+                    is_done = True
+                    break
+
+                if isinstance(item, Exception):
+                    yield b"".join(batch)
+                    raise item
+
+                batch.append(item)
+
+            yield b"".join(batch)
+    finally:
+        task.cancel()
+
+        with contextlib.suppress(asyncio.CancelledError):
+            await task
+
+
+def response(
+    events: t.AsyncIterator[bytes],
+    window: float | None = None,
+    max_events: int | None = None,
+) -> StreamingHttpResponse:
+    if window is None:
+        window = settings.SSE_COALESCE_WINDOW
+
+    if max_events is None:
+        max_events = settings.SSE_COALESCE_MAX_EVENTS
+
+    return StreamingHttpResponse(
+        coalesce(events, window=window, max_events=max_events),
+        content_type="text/event-stream",
+        headers={
+            "X-Accel-Buffering": "no",
+            "Cache-Control": "no-cache",
+        },
+    )
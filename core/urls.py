@@ -9,6 +9,7 @@ urlpatterns = [
     path(r"fact/", core_views.RandomFactView.as_view(), name="fact"),
     path(r"spv/", core_views.SPVIew.as_view(), name="spv"),
     path(r"favicon.ico", core_views.favicon_view, name="favicon"),
+    path(r"metrics/", core_views.metrics_view, name="metrics"),
     path(r"sse/", core_views.stream_view, name="sse"),
     path(r"sio/", core_views.SioView.as_view(), name="sio"),
     path(r"zmq/sse/", core_views.ZmqIpcStreamView.as_view(), name="zmqsse"),
@@ -47,6 +48,11 @@ urlpatterns = [
     path("conway/", core_views.ConwayView.as_view(), name="conway"),
     path("conway/sse/", core_views.conway_see_view, name="conwaysse"),
     path("bucket/", core_views.bucket_view, name="bucket"),
+    path(
+        "bucket/<path:name>",
+        core_views.BucketObjectView.as_view(),
+        name="bucket_object",
+    ),
     path("nats_pubsub/", core_views.nats_pubsub_view, name="nats_pubsub"),
     path("nats_pubsub/pub/", core_views.nats_pub_view, name="nats_pub"),
     path(
@@ -1,26 +1,33 @@
 import asyncio
+import contextlib
 import dataclasses
 import datetime
+import functools
 import json
 import random
-import textwrap
 import time
 import typing as t
 import uuid
 
-import asgiref.sync
-import nats
-import ollama
+import nats.errors
+import nats.js.errors
+import numpy as np
 import psycopg
-import psycopg_pool
 import valkey.asyncio as valkey
 from django import forms
 from django.conf import settings
 from django.db import connection
-from django.http import HttpRequest, HttpResponse, StreamingHttpResponse
+from django.http import (
+    Http404,
+    HttpRequest,
+    HttpResponse,
+    JsonResponse,
+    StreamingHttpResponse,
+)
 from django.shortcuts import get_object_or_404, render
 from django.urls import reverse
 from django.utils import lorem_ipsum
+from django.utils.http import content_disposition_header
 from django.views import View
 from django.views.generic import (
     CreateView,
@@ -31,9 +38,19 @@ from django.views.generic import (
 )
 
 # from glide import GlideClient, GlideClientConfiguration, NodeAddress
-from nats.js.errors import BucketNotFoundError
 
-from core import ipc
+from core import (
+    assistant,
+    conway,
+    facts,
+    ipc,
+    llm,
+    metrics,
+    natsconn,
+    objects,
+    shm,
+    sse,
+)
 from db import aconn
 from db import models as db_models
 
@@ -50,6 +67,12 @@ class IndexView(View):
         return render(request, "core/index.html", {})
 
 
+def metrics_view(request: HttpRequest) -> HttpResponse:
+    return HttpResponse(
+        metrics.render(), content_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
+
 class RandomFactView(View):
     def get(self, request: HttpRequest) -> HttpResponse:
         return render(request, "core/llm.html", {})
@@ -59,57 +82,99 @@ def get_sleep_time() -> float:
     return random.randint(0, 5) / 100
 
 
-async def stream_view(request: HttpRequest) -> StreamingHttpResponse:
-    async def llm_event_stream() -> t.AsyncIterator:
-        client = ollama.AsyncClient(
-            host=f"http://{settings.OLLAMA_HOST}:{settings.OLLAMA_PORT}"
-        )
-        stream: t.AsyncIterator[ollama.ChatResponse] = await client.chat(
-            model="qwen3:0.6b",
-            messages=[
-                {
-                    "role": "user",
-                    "content": "Generate a random fact.",
-                }
-            ],
-            stream=True,
+STREAM_BUFFERS = sse.StreamBuffers()
+
+
+async def stream_view(
+    request: HttpRequest,
+) -> HttpResponse | StreamingHttpResponse:
+    requested_at = time.monotonic()
+
+    async def llm_event_stream(
+        flight: llm.Follower,
+    ) -> t.AsyncIterator[tuple[str, str]]:
+        stream = llm.time_to_first_token(
+            flight.stream(),
+            model=facts.MODEL,
+            endpoint="sse",
+            requested_at=requested_at,
         )
-        async for resp in stream:
-            token = resp.message.content
-            yield "event: llm\n"
-            yield f"data: {token}\n\n"
 
-        yield "event: end\n"
-        yield "data:\n\n"
+        async with contextlib.aclosing(stream):
+            async for resp in stream:
+                token = resp.message.content
+                yield "llm", token
+
+        yield "end", ""
 
-    async def lorem_event_stream() -> t.AsyncIterator:
+    async def pooled_event_stream(
+        tokens: list[str],
+    ) -> t.AsyncIterator[tuple[str, str]]:
+        async for token in facts.replay(tokens, settings.FACT_POOL_TOKEN_DELAY):
+            yield "llm", token
+
+        yield "end", ""
+
+    async def lorem_event_stream() -> t.AsyncIterator[tuple[str, str]]:
         paragraphs = lorem_ipsum.paragraphs(2)
 
         for paragraph in paragraphs:
             tokens = paragraph.split()
 
-            for index, token in enumerate(tokens):
-                yield "event: lorem\n"
-                yield f"id: {index}\n"
-                yield f"data: {token}\n\n"
+            for token in tokens:
+                yield "lorem", token
 
                 await asyncio.sleep(get_sleep_time())
 
-        yield "event: end\n"
-        yield "data:\n\n"
+        yield "end", ""
+
+    async def event_stream(
+        events: t.AsyncIterator[tuple[str, str]], last_event_id: str
+    ) -> t.AsyncIterator[bytes]:
+        is_reset = False
+
+        if last_event_id:
+            previous = STREAM_BUFFERS.get(last_event_id)
+            missed = previous.since(last_event_id) if previous else None
+
+            if previous and missed is not None and STREAM_BUFFERS.is_complete(previous):
+                # The stream finished while the client was away, hand over
+                # the tail. A client which is already caught up gets a new one.
+                if missed:
+                    for item in missed:
+                        yield sse.encode_event(item)
+                    return
+            else:
+                is_reset = True
+
+        buffer = STREAM_BUFFERS.new()
+
+        if is_reset:
+            yield sse.encode_event(buffer.append(sse.RESET_EVENT, ""))
+
+        # Closing the events as soon as the client is gone frees the model.
+        async with contextlib.aclosing(events):
+            async for event, data in events:
+                yield sse.encode_event(buffer.append(event, data))
+
+        STREAM_BUFFERS.mark_complete(buffer)
 
     if request.GET.get("t", "") == "lorem":
-        event_stream = lorem_event_stream()
+        events = lorem_event_stream()
+    elif tokens := facts.pool.take():
+        events = pooled_event_stream(tokens)
     else:
-        event_stream = llm_event_stream()
-
-    return StreamingHttpResponse(
-        event_stream,
-        content_type="text/event-stream",
-        headers={
-            "X-Accel-Buffering": "no",
-            "Cache-Control": "no-cache",
-        },
+        try:
+            flight = await llm.client.flight(
+                endpoint="sse", model=facts.MODEL, messages=facts.MESSAGES
+            )
+        except llm.Busy as ex:
+            return llm.busy_response(ex)
+
+        events = llm_event_stream(flight)
+
+    return sse.response(
+        event_stream(events, last_event_id=sse.get_last_event_id(request))
     )
 
 
@@ -215,35 +280,43 @@ class SPVIew(View):
         return render(request, template_name, context)
 
 
-class ChatEventView(View):
-    async def event_stream(
-        self, pool: psycopg_pool.AsyncConnectionPool[psycopg.AsyncConnection]
-    ) -> t.AsyncGenerator:
-        yield "event:connected\n"
-        yield "data:\n\n"
+async def chat_messages_source(channel: sse.EventChannel) -> None:
+    hub = aconn.get_listen_hub("messages")
 
-        async with pool.connection() as conn:
-            await conn.execute("LISTEN messages;")
+    async with hub.subscribe() as queue:
+        while True:
+            notify = await queue.get()
 
-            async for notify in conn.notifies():
-                if notify.payload == "stop":
-                    break
+            if isinstance(notify, psycopg.Error):
+                # Messages sent until the hub listens again are missed, so
+                # clients reload the list.
+                channel.publish(sse.RESET_EVENT, "")
+                continue
+
+            if notify.payload == "stop":
+                channel.publish("close", "")
+                continue
+
+            task_count = len(asyncio.all_tasks())
+            channel.publish("message", f"{task_count}")
+
+
+CHAT_CHANNEL = sse.EventChannel("messages", source=chat_messages_source)
 
-                task_count = len(asyncio.all_tasks())
-                yield "event:message\n"
-                yield f"data:{task_count}\n\n"
 
-        yield "event: close\n"
-        yield "data:\n\n"
+class ChatEventView(View):
+    async def event_stream(self, last_event_id: str) -> t.AsyncGenerator:
+        yield sse.encode("connected")
+
+        async for event in sse.channel_events(CHAT_CHANNEL, last_event_id):
+            yield sse.encode_event(event)
+
+            if event.event == "close":
+                break
 
     async def get(self, request: HttpRequest) -> StreamingHttpResponse:
-        pool = await aconn.get_connection_pool()
-        response = StreamingHttpResponse(
-            self.event_stream(pool=pool), content_type="text/event-stream"
-        )
-        response["Cache-Control"] = "nocache"
-        response["Connection"] = "keep-alive"
-        return response
+        last_event_id = sse.get_last_event_id(request)
+        return sse.response(self.event_stream(last_event_id=last_event_id))
 
 
 class ChatForm(forms.Form):
@@ -300,8 +373,7 @@ class SioView(View):
 
 class ZmqIpcStreamView(View):
     async def stream_events(self) -> t.AsyncGenerator:
-        yield "event:connected\n"
-        yield "data:\n\n"
+        yield sse.encode("connected")
 
         should_subscribe = True
 
@@ -313,21 +385,14 @@ class ZmqIpcStreamView(View):
                     should_subscribe = False
                     break
 
-                yield "event:current_time\n"
-                yield "data:current_time\n\n"
+                yield sse.encode("current_time", "current_time")
             except TimeoutError:
-                yield "event:ping\n"
-                yield "data:ping\n\n"
+                yield sse.encode("ping", "ping")
 
-        yield "event:disconnected\n"
-        yield "data:\n\n"
+        yield sse.encode("disconnected")
 
     async def get(self, request: HttpRequest) -> StreamingHttpResponse:
-        return StreamingHttpResponse(
-            self.stream_events(),
-            content_type="text/event-stream",
-            headers={"Cache-Control": "no-cache"},
-        )
+        return sse.response(self.stream_events())
 
 
 class ZmqIpcView(View):
@@ -350,20 +415,14 @@ class ZmqIpcView(View):
 
 async def task_count_sse(request: HttpRequest) -> StreamingHttpResponse:
     async def event_stream() -> t.AsyncGenerator:
-        yield "event: connected\n"
-        yield "data: connected\n\n"
+        yield sse.encode("connected", "connected")
 
         while True:
             await asyncio.sleep(1)
 
-            yield "event: ping\n"
-            yield "data: ping\n\n"
+            yield sse.encode("ping", "ping")
 
-    stream = event_stream()
-    response = StreamingHttpResponse(stream, content_type="text/event-stream")
-    response["Connection"] = "keep-alive"
-    response["Cache-Control"] = "no-cache"
-    return response
+    return sse.response(event_stream())
 
 
 # class TaskCountSSEView(View):
@@ -489,38 +548,46 @@ async def task_count_sse(request: HttpRequest) -> StreamingHttpResponse:
 valkey_pool = valkey.ConnectionPool(host="localhost", port=6379)
 
 
-async def valkey_stream(request: HttpRequest) -> StreamingHttpResponse:
-    async def event_stream() -> t.AsyncIterator:
-        yield "event: connected\n"
-        yield "data:\n\n"
+async def valkey_ipc_source(channel: sse.EventChannel) -> None:
+    conn = valkey.Valkey.from_pool(valkey_pool)
 
-        conn = valkey.Valkey.from_pool(valkey_pool)
-        async with conn.pubsub() as pubsub:
-            await pubsub.subscribe("channel:ipc")
+    async with conn.pubsub() as pubsub:
+        await pubsub.subscribe("channel:ipc")
 
-            while True:
-                message = await pubsub.get_message(ignore_subscribe_messages=True)
+        while True:
+            message = await pubsub.get_message(
+                ignore_subscribe_messages=True, timeout=None
+            )
 
-                if message is None:
-                    continue
+            if message is None:
+                continue
 
-                data = message["data"].decode()
+            data = message["data"].decode()
 
-                if data == "break":
-                    break
+            if data == "break":
+                channel.publish("disconnected", "")
+                continue
+
+            current_time = datetime.datetime.now()
+            current_time_serialized = current_time.isoformat()
+            channel.publish("current_time", current_time_serialized)
+
+
+VALKEY_IPC_CHANNEL = sse.EventChannel("channel:ipc", source=valkey_ipc_source)
+
+
+async def valkey_stream(request: HttpRequest) -> StreamingHttpResponse:
+    async def event_stream(last_event_id: str) -> t.AsyncIterator:
+        yield sse.encode("connected")
 
-                current_time = datetime.datetime.now()
-                current_time_serialized = current_time.isoformat()
-                yield "event: current_time\n"
-                yield f"data: {current_time_serialized}\n\n"
+        async for event in sse.channel_events(VALKEY_IPC_CHANNEL, last_event_id):
+            yield sse.encode_event(event)
 
-        yield "event:disconnected\n"
-        yield "data:\n\n"
+            if event.event == "disconnected":
+                break
 
-    response = StreamingHttpResponse(event_stream(), content_type="text/event-stream")
-    response["Cache-Control"] = "no-cache"
-    response["Connection"] = "keep-alive"
-    return response
+    last_event_id = sse.get_last_event_id(request)
+    return sse.response(event_stream(last_event_id=last_event_id))
 
 
 async def valkey_view(request: HttpRequest) -> HttpResponse:
@@ -529,24 +596,25 @@ async def valkey_view(request: HttpRequest) -> HttpResponse:
 
 
 async def datastar_sse_view(request: HttpRequest) -> StreamingHttpResponse:
-    async def event_stream() -> t.AsyncIterator[str]:
-        yield "event: connected\n"
-        yield "data:\n\n"
+    async def event_stream() -> t.AsyncIterator[bytes]:
+        yield sse.encode("connected")
 
         while True:
             div_id = random.choice([1, 2, 3, 4, 5])
             colour = random.choice(["blue", "red", "green"])
 
-            yield "event: datastar-patch-elements\n"
-            yield "data: mode replace\n"
-            yield "data: useViewTransition false\n"
-            yield f'data: elements <div id="{div_id}" style="background: {colour}; width: 100px; height: 10px;"></div>\n\n'
+            element = f'<div id="{div_id}" style="background: {colour}; width: 100px; height: 10px;"></div>'
+            yield sse.encode_lines(
+                "datastar-patch-elements",
+                [
+                    "mode replace",
+                    "useViewTransition false",
+                    f"elements {element}",
+                ],
+            )
             await asyncio.sleep(1.0 / 4.0)
 
-    response = StreamingHttpResponse(event_stream(), content_type="text/event-stream")
-    response["Cache-Control"] = "no-cache"
-    response["Connection"] = "keep-alive"
-    return response
+    return sse.response(event_stream())
 
 
 def datastar_view(request: HttpRequest) -> HttpResponse:
@@ -590,276 +658,220 @@ def service_worker_js_view(request: HttpRequest) -> HttpResponse:
     return render(request, "core/sw.js", {}, content_type="application/javascript")
 
 
-CONWAY_GRID = {}
-CONWAY_GRID_SIZE = 100
-
-
-def is_top_row(index: int, size: int) -> bool:
-    return index < size
-
-
-def is_bottom_row(index: int, size: int) -> bool:
-    length = size**2
-    return (length - size) <= index < length
-
-
-def is_left_row(index: int, size: int) -> bool:
-    return index % size == 0
-
-
-def is_right_row(index: int, size: int) -> bool:
-    return (index + 1) % size == 0
-
-
-def get_neighbour_indexes(index: int, size: int) -> list[int]:
-    is_top = is_top_row(index, size)
-    is_bottom = is_bottom_row(index, size)
-    is_left = is_left_row(index, size)
-    is_right = is_right_row(index, size)
-
-    available_neigbors = ["T", "TR", "R", "BR", "B", "BL", "L", "TL"]
-    available_neigbors_top = ["L", "R", "B", "BL", "BR"]
-    available_neigbors_bottom = ["L", "R", "T", "TL", "TR"]
-    available_neigbors_left = ["T", "R", "B", "TR", "BR"]
-    available_neigbors_right = ["T", "L", "B", "TL", "BL"]
-
-    neigbors = set(available_neigbors)
-
-    if is_top:
-        neigbors = neigbors & set(available_neigbors_top)
-    if is_left:
-        neigbors = neigbors & set(available_neigbors_left)
-    if is_right:
-        neigbors = neigbors & set(available_neigbors_right)
-    if is_bottom:
-        neigbors = neigbors & set(available_neigbors_bottom)
-
-    neighbour_indexes = []
-    for neigbor in neigbors:
-        if neigbor == "T":
-            neighbour_indexes.append(index - size)
-        elif neigbor == "TR":
-            neighbour_indexes.append(index - size + 1)
-        elif neigbor == "R":
-            neighbour_indexes.append(index + 1)
-        elif neigbor == "BR":
-            neighbour_indexes.append(index + size + 1)
-        elif neigbor == "B":
-            neighbour_indexes.append(index + size)
-        elif neigbor == "BL":
-            neighbour_indexes.append(index + size - 1)
-        elif neigbor == "L":
-            neighbour_indexes.append(index - 1)
-        elif neigbor == "TL":
-            neighbour_indexes.append(index - size - 1)
-
-    # print("*" * 10)
-    # print("index", index)
-    # print("is_top", is_top)
-    # print("is_bottom", is_bottom)
-    # print("is_left", is_left)
-    # print("is_right", is_right)
-    # print(neigbors)
-    # print(neighbour_indexes)
-    # print("*" * 10)
-
-    return neighbour_indexes
-
-
-@dataclasses.dataclass(slots=True, eq=False, repr=False)
-class ConwayCell:
-    index: int
-    value: int
-    class_value: str
-
-
-def process_cell(cell: ConwayCell, neighbours: list[ConwayCell]) -> tuple[int, str]:
-    """
-    Any live cell with fewer than two live neighbours dies, as if by underpopulation.
-    Any live cell with two or three live neighbours lives on to the next generation.
-    Any live cell with more than three live neighbours dies, as if by overpopulation.
-    Any dead cell with exactly three live neighbours becomes a live cell, as if by reproduction.
-    """
-    neighbour_live_count = sum(neighbour.value for neighbour in neighbours)
-    is_alive = cell.value == 1
-
-    if is_alive and neighbour_live_count < 2:
-        return 0, ""
-    elif is_alive and neighbour_live_count in (2, 3):
-        return 1, "alive"
-    elif is_alive and neighbour_live_count > 3:
-        return 0, ""
-    elif not is_alive and neighbour_live_count == 3:
-        return 1, "alive"
+CONWAY_BOARD = conway.SharedBoard(
+    engine=conway.get_engine(
+        settings.CONWAY_ENGINE,
+        settings.CONWAY_GRID_SIZE,
+        **settings.CONWAY_ENGINE_OPTIONS,
+    ),
+    interval=settings.CONWAY_TICK_INTERVAL,
+    name=settings.CONWAY_SHARED_NAME,
+    keyframe_interval=settings.CONWAY_KEYFRAME_INTERVAL,
+)
+
+
+@functools.lru_cache(maxsize=8)
+def encode_conway_frame(frame: conway.Frame, keyframe: bool) -> bytes:
+    if keyframe:
+        cells = enumerate(frame.cells.tolist())
+    elif frame.changed.size:
+        cells = zip(frame.changed.tolist(), frame.cells[frame.changed].tolist())
     else:
-        return 0, ""
+        return b""
 
+    lines = ["mode outer"]
 
-async def conway_see_view(request: HttpRequest) -> StreamingHttpResponse:
-    async def event_stream() -> t.AsyncIterator[str]:
-        global CONWAY_GRID
+    for index, value in cells:
+        class_value = "alive" if value else ""
+        element = f'<div id="{index}" class="cell {class_value}"></div>'
+        lines.append(f"elements {element}")
+
+    return sse.encode_lines("datastar-patch-elements", lines)
+
+
+@functools.lru_cache(maxsize=8)
+def encode_conway_bitmap(frame: conway.Frame, keyframe: bool) -> bytes:
+    if keyframe:
+        return sse.encode("conway-keyframe", conway.pack_bitmap(frame.cells))
+    elif frame.changed.size:
+        flipped = np.zeros(frame.cells.size, dtype=np.uint8)
+        flipped[frame.changed] = 1
+        return sse.encode("conway-delta", conway.pack_bitmap(flipped))
+    else:
+        return b""
+
+
+def describe_conway_period(period: int) -> str:
+    if period == 0:
+        return "running"
+    elif period == 1:
+        return "still life"
+    else:
+        return f"cycling with period {period}"
+
+
+def encode_conway_state(period: int) -> bytes:
+    state = describe_conway_period(period)
+    return sse.encode_lines(
+        "datastar-patch-elements",
+        ["mode outer", f'elements <p id="conway-state">{state}</p>'],
+    )
 
-        yield "event: connected\n"
-        yield "data:\n\n"
 
-        tick_counter = 0
+def encode_conway_bitmap_state(period: int) -> bytes:
+    return sse.encode("conway-state", describe_conway_period(period))
+
+
+CONWAY_FRAME_ENCODERS = {
+    "html": (encode_conway_frame, encode_conway_state),
+    "bitmap": (encode_conway_bitmap, encode_conway_bitmap_state),
+}
+
+
+async def conway_see_view(request: HttpRequest) -> StreamingHttpResponse:
+    encode_frame, encode_state = CONWAY_FRAME_ENCODERS.get(
+        request.GET.get("format", ""), CONWAY_FRAME_ENCODERS["html"]
+    )
+
+    async def event_stream() -> t.AsyncIterator[bytes]:
+        yield sse.encode("connected")
 
         try:
-            while True:
-                tick_counter += 1
-                changes_for_publishing = []
-
-                start_time = time.monotonic()
-                for index in range(CONWAY_GRID_SIZE**2):
-                    cell_lookup = CONWAY_GRID[index]
-                    cell = cell_lookup["self"]
-                    neighbours = cell_lookup["neighbours"]
-
-                    new_value, new_class_value = process_cell(cell, neighbours)
-                    changes_for_publishing.append((index, new_value, new_class_value))
-
-                total_seconds = time.monotonic() - start_time
-                total_milliseconds = total_seconds * 1000
-                print("total_milliseconds", f"{total_milliseconds:0.4f}")
-
-                if changes_for_publishing:
-                    yield "event: datastar-patch-elements\n"
-                    yield "data: mode outer\n"
-
-                    for index, new_value, new_class_value in changes_for_publishing:
-                        cell_lookup = CONWAY_GRID[index]
-                        cell = cell_lookup["self"]
-                        cell.value = new_value
-                        cell.class_value = new_class_value
-
-                        element = (
-                            f'<div id="{index}" class="cell {new_class_value}"></div>'
-                        )
-                        yield f"data: elements {element}\n"
-                    yield "\n"
-
-                await asyncio.sleep(1 / 5)
+            async with CONWAY_BOARD.subscribe() as frames:
+                previous = None
+
+                while True:
+                    frame = await frames.get()
+
+                    if isinstance(frame, Exception):
+                        raise frame
+
+                    keyframe = frame.is_keyframe or not frame.follows(previous)
+
+                    if keyframe or (previous and previous.period != frame.period):
+                        yield encode_state(frame.period)
+
+                    previous = frame
+                    data = encode_frame(frame, keyframe)
+
+                    if data:
+                        yield data
         except Exception as ex:
-            yield "event: disconnected\n"
-            yield "data:\n\n"
+            yield sse.encode("disconnected")
             raise ex
 
-    response = StreamingHttpResponse(event_stream(), content_type="text/event-stream")
-    response["Cache-Control"] = "no-cache"
-    response["Connection"] = "keep-alive"
-    return response
+    return sse.response(event_stream())
 
 
 class ConwayView(View):
     template_name: str = ""
 
-    def get(self, request: HttpRequest) -> HttpResponse:
-        global CONWAY_GRID
-
-        CONWAY_GRID = {}
-        cells = []
-        length = CONWAY_GRID_SIZE**2
-        for index in range(length):
-            if random.random() < 0.2:
-                value = 1
-                class_value = "alive"
-            else:
-                value = 0
-                class_value = ""
-
-            cell = ConwayCell(
-                index=index,
-                value=value,
-                class_value=class_value,
-            )
-            cells.append(cell)
-            CONWAY_GRID[index] = {"self": cell}
-
-        for index in range(length):
-            neighbour_indexes = get_neighbour_indexes(index, CONWAY_GRID_SIZE)
-            neighbours = [
-                CONWAY_GRID[neighbour_index]["self"]
-                for neighbour_index in neighbour_indexes
-            ]
-            CONWAY_GRID[index]["neighbours"] = neighbours
+    async def get(self, request: HttpRequest) -> HttpResponse:
+        # Seeding goes through shared memory, so the worker ticking the board
+        # picks it up whichever worker served this request.
+        cells = conway.random_cells(CONWAY_BOARD.size)
+        await CONWAY_BOARD.aseed(cells)
 
-        return render(
-            request,
-            "core/conway.html",
-            {"cells": cells, "size": CONWAY_GRID_SIZE},
-        )
+        frame_format = request.GET.get("format", "html")
+        context = {"size": CONWAY_BOARD.size, "format": frame_format}
 
+        # The canvas is painted from the first keyframe instead.
+        if frame_format != "bitmap":
+            context["cells"] = cells.tolist()
 
-async def bucket_view(request: HttpRequest) -> HttpResponse:
-    nc = await nats.connect(servers=["nats://localhost:4222"])
-    js = nc.jetstream()
+        return render(request, "core/conway.html", context)
 
-    try:
-        object_store = await js.object_store("stuff")
-    except BucketNotFoundError:
-        object_store = await js.create_object_store("stuff")
 
+async def bucket_view(request: HttpRequest) -> HttpResponse:
+    object_store = await objects.get_store()
     bucket_status = await object_store.status()
-
-    data = bytes(10000000)
-    name = uuid.uuid4()
-    info = await object_store.put(f"{name}", data)
-
-    entries = await object_store.list()
+    entries = await objects.list_entries()
 
     return render(
         request,
         "core/bucket.html",
-        {"bucket_status": bucket_status, "info": info, "entries": entries},
+        {"bucket_status": bucket_status, "entries": entries},
     )
 
 
+class BucketObjectView(View):
+    async def get(self, request: HttpRequest, name: str) -> StreamingHttpResponse:
+        object_store = await objects.get_store()
+        entry = await objects.lookup(name)
+
+        try:
+            info = await object_store.get_info(entry.object if entry else name)
+        except nats.js.errors.NotFoundError:
+            raise Http404(name)
+
+        return StreamingHttpResponse(
+            objects.download(info),
+            content_type="application/octet-stream",
+            headers={
+                "Content-Length": f"{info.size}",
+                "Content-Disposition": content_disposition_header(True, name),
+                "ETag": f'"{info.digest}"',
+            },
+        )
+
+    async def post(self, request: HttpRequest, name: str) -> HttpResponse:
+        object_store = await objects.get_store()
+        digest = request.headers.get(objects.DIGEST_HEADER, "")
+
+        try:
+            entry, is_stored = await objects.put(object_store, name, request, digest)
+        except objects.DigestMismatch as ex:
+            return HttpResponse(f"{ex}".encode(), status=400)
+
+        # Asked whether the content is stored, it is not, so send it.
+        if entry is None:
+            return HttpResponse(b"Unknown digest, upload the content.", status=412)
+
+        return JsonResponse(
+            {**dataclasses.asdict(entry), "deduplicated": is_stored},
+            status=200 if is_stored else 201,
+        )
+
+
 async def nats_pubsub_view(request: HttpRequest) -> HttpResponse:
     return render(request, "core/nats_pubsub.html")
 
 
-NATS_CONNECTIONS = 0
+NATS_CONNECTIONS = shm.SharedCounter("nats-connections")
 
 
 async def nats_pub_view(request: HttpRequest) -> HttpResponse:
-    global NATS_CONNECTIONS
-    NATS_CONNECTIONS += 1
-    nc = await nats.connect(servers=["nats://localhost:4222"])
-    await nc.publish("nats_pubsub_view", f"{NATS_CONNECTIONS}".encode())
+    connections = await NATS_CONNECTIONS.aincrement()
+    await natsconn.connection.publish("nats_pubsub_view", f"{connections}".encode())
     return render(request, "core/nats_pubsub.html")
 
 
-class NatsPubSubSSEView(View):
-    async def stream_events(self, sub: t.Any) -> t.AsyncGenerator:
-        yield "event:connected\n"
-        yield "data:\n\n"
+async def nats_pubsub_source(channel: sse.EventChannel) -> None:
+    async with natsconn.multiplexer.listen("nats_pubsub_view") as listener:
+        async for data in listener:
+            if data == "break":
+                channel.publish("disconnected", "")
+                continue
 
-        should_subscribe = True
+            channel.publish("message", data)
 
-        while should_subscribe:
-            try:
-                async for message in sub.messages:
-                    if message == "break":
-                        should_subscribe = False
-                        break
 
-                    yield "event:message\n"
-                    yield f"data:{message}\n\n"
-            except TimeoutError:
-                yield "event:ping\n"
-                yield "data:ping\n\n"
+NATS_PUBSUB_CHANNEL = sse.EventChannel("nats_pubsub_view", source=nats_pubsub_source)
+
+
+class NatsPubSubSSEView(View):
+    async def stream_events(self, last_event_id: str) -> t.AsyncGenerator:
+        yield sse.encode("connected")
+
+        async for event in sse.channel_events(NATS_PUBSUB_CHANNEL, last_event_id):
+            yield sse.encode_event(event)
 
-        yield "event:disconnected\n"
-        yield "data:\n\n"
+            if event.event == "disconnected":
+                break
 
     async def get(self, request: HttpRequest) -> StreamingHttpResponse:
-        nc = await nats.connect(servers=["nats://localhost:4222"])
-        sub = await nc.subscribe("nats_pubsub_view")
-        return StreamingHttpResponse(
-            self.stream_events(sub),
-            content_type="text/event-stream",
-            headers={"Cache-Control": "no-cache"},
-        )
+        last_event_id = sse.get_last_event_id(request)
+        return sse.response(self.stream_events(last_event_id=last_event_id))
 
 
 class CustomerListView(ListView):
@@ -918,249 +930,43 @@ class CustomerUpdateView(UpdateView):
         return kwargs
 
 
-tools = [
-    {
-        "type": "function",
-        "function": {
-            "name": "view_customer",
-            "description": "View a customer",
-            "parameters": {
-                "type": "object",
-                "properties": {
-                    "customer_id": {
-                        "type": "int",
-                        "description": "The customer ID to view",
-                    },
-                },
-                "required": ["customer_id"],
-            },
-        },
-    },
-    {
-        "type": "function",
-        "function": {
-            "name": "delete_customer",
-            "description": "Delete a customer",
-            "parameters": {
-                "type": "object",
-                "properties": {
-                    "customer_id": {
-                        "type": "int",
-                        "description": "The customer ID to delete",
-                    },
-                },
-                "required": ["customer_id"],
-            },
-        },
-    },
-    {
-        "type": "function",
-        "function": {
-            "name": "create_customer",
-            "description": "Create a customer",
-            "parameters": {
-                "type": "object",
-                "properties": {
-                    "name": {
-                        "type": "string",
-                        "description": "The name of the customer",
-                    },
-                    "address": {
-                        "type": "string",
-                        "description": "The address of the customer",
-                    },
-                },
-                "required": ["name"],
-            },
-        },
-    },
-    {
-        "type": "function",
-        "function": {
-            "name": "update_customer",
-            "description": "Update a customer",
-            "parameters": {
-                "type": "object",
-                "properties": {
-                    "customer_id": {
-                        "type": "int",
-                        "description": "The customer ID to view",
-                        "widget": "hidden",
-                    },
-                    "name": {
-                        "type": "string",
-                        "description": "The name of the customer",
-                    },
-                    "address": {
-                        "type": "string",
-                        "description": "The address of the customer",
-                    },
-                },
-                "required": ["customer_id"],
-            },
-        },
-    },
-]
+async def get_assistant_client_id(request: HttpRequest) -> str:
+    """Identifies the browser so answers reach the stream which asked."""
+    client_id = await request.session.aget("assistant_client_id")
+
+    if client_id is None:
+        client_id = uuid.uuid4().hex
+        await request.session.aset("assistant_client_id", client_id)
+
+    return client_id
 
 
 class AIStreamView(View):
-    async def stream_events(
-        self,
-        client: ollama.AsyncClient,
-        sub: t.Any,
-    ) -> t.AsyncGenerator:
-        async for message in sub.messages:
-            customers = await asgiref.sync.sync_to_async(self.get_customers)()
-            customer_map = {c.pk: c for c in customers}  # type:ignore
-
-            context = self.get_context(customers=customers)
-            system_prompt = textwrap.dedent(f"""You are an assistant which provides tool calls based on user queries.
-
-            The user queries relate to calling actions which create, update or view a customer.
-            The available customers you can use for the view function are as follows.
-
-            ===Context===
-            {context}
-            ===Context===
-            """)
-
-            question = message.data.decode()
-            stream: t.AsyncIterator[ollama.ChatResponse] = await client.chat(
-                model="qwen3:0.6b",
-                messages=[
-                    {
-                        "role": "system",
-                        "content": system_prompt,
-                    },
-                    {
-                        "role": "user",
-                        "content": f"===Question===\n{question}\n===Question===",
-                    },
-                ],
-                stream=True,
-                tools=tools,
-            )
+    async def stream_events(self, client_id: str) -> t.AsyncGenerator:
+        subject = assistant.reply_subject(client_id)
 
-            tool_calls = []
-            async for resp in stream:
-                token = resp.message.content
-                yield "event: llm\n"
-                yield f"data: {token}\n\n"
-
-                if resp.message.tool_calls:
-                    tool_calls.extend(resp.message.tool_calls)
-
-            if tool_calls:
-                for tc in tool_calls:
-                    function = tc.function
-                    fname = function.name
-                    arguments = function.arguments
-                    anchor = ""
-
-                    if fname == "update_customer":
-                        try:
-                            customer_id = arguments["customer_id"]
-                        except KeyError:
-                            continue
-
-                        name = arguments.get("name", "")
-                        address = arguments.get("address", "")
-                        href = reverse("customer_update", kwargs={"pk": customer_id})
-                        href = f"{href}?name={name}&address={address}"
-                        message = f"Update Customer {customer_id=}"
-
-                        if name:
-                            message += f" {name=}"
-
-                        if address:
-                            message += f" {address=}"
-
-                        anchor = f'<a class="text-underline text-blue-500" href="{href}">{message}</a>'
-                    elif fname == "delete_customer":
-                        try:
-                            customer_id = arguments["customer_id"]
-                        except KeyError:
-                            continue
-                        href = reverse("customer_delete", kwargs={"pk": customer_id})
-
-                        message = "Delete Customer"
-                        customer = customer_map.get(customer_id, None)
-
-                        if not customer:
-                            continue
-
-                        message += f" - {customer.name}"
-                        anchor = f'<a class="text-underline text-blue-500" href="{href}">{message}</a>'
-                    elif fname == "view_customer":
-                        try:
-                            customer_id = arguments["customer_id"]
-                        except KeyError:
-                            continue
-                        href = reverse("customer_detail", kwargs={"pk": customer_id})
-                        message = "View Customer"
-                        customer = customer_map.get(customer_id, None)
-
-                        if not customer:
-                            continue
-
-                        message += f" - {customer.name}"
-
-                        anchor = f'<a class="text-underline text-blue-500" href="{href}">{message}</a>'
-                    elif fname == "create_customer":
-                        name = arguments.get("name", "")
-                        address = arguments.get("address", "")
-                        href = reverse("customer_create")
-                        href = f"{href}?name={name}&address={address}"
-                        message = "Create Customer"
-
-                        if name:
-                            message += f" {name=}"
-
-                        if address:
-                            message += f" {address=}"
-
-                        anchor = f'<a class="hover:underline text-blue-500" href="{href}">{message}</a>'
-
-                    if not anchor:
-                        continue
-
-                    yield "event: anchor\n"
-                    yield f"data: {anchor}\n\n"
-
-            yield "event: end\n"
-            yield "data:\n\n"
-
-    def get_customers(self) -> t.Any:
-        return list(db_models.Customer.objects.all())
-
-    def get_context(self, customers: t.Any) -> str:
-        context = ""
-        for customer in customers:
-            context += textwrap.dedent(f"""<Customer>
-                customer_id {customer.pk}
-                Name to ID Mapping {customer.name} = {customer.pk}
-                ID to Name Mapping {customer.pk} = {customer.name}
-            </Customer>\n
-            """)
-        return context
+        # Replies are not kept for clients that are not listening, so the
+        # page only asks once it saw connected, which is sent once the
+        # subscription exists.
+        try:
+            async with natsconn.multiplexer.listen(subject) as listener:
+                yield sse.encode("connected")
 
-    async def get(self, request: HttpRequest) -> StreamingHttpResponse:
-        client = ollama.AsyncClient(
-            host=f"http://{settings.OLLAMA_HOST}:{settings.OLLAMA_PORT}",
-        )
-        nc = await nats.connect(servers=["nats://localhost:4222"])
-        sub = await nc.subscribe("customer_ai")
+                async for event in listener:
+                    yield event.encode()
+        finally:
+            # Nobody reads the answers any more, so stop generating them.
+            with contextlib.suppress(nats.errors.Error):
+                await assistant.queue.cancel(client_id)
 
-        return StreamingHttpResponse(
-            self.stream_events(client=client, sub=sub),
-            content_type="text/event-stream",
-            headers={"Cache-Control": "no-cache"},
-        )
+    async def get(self, request: HttpRequest) -> StreamingHttpResponse:
+        client_id = await get_assistant_client_id(request)
+        return sse.response(self.stream_events(client_id=client_id))
 
     async def post(self, request: HttpRequest) -> HttpResponse:
-        nc = await nats.connect(servers=["nats://localhost:4222"])
+        client_id = await get_assistant_client_id(request)
         payload_raw = request.body
         payload = json.loads(payload_raw)
         q = payload["q"]
-        await nc.publish("customer_ai", f"{q}".encode())
+        await assistant.queue.ask(client_id, f"{q}")
         return HttpResponse(b"")
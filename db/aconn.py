@@ -1,7 +1,14 @@
+import asyncio
+import contextlib
+import typing as t
+
 import psycopg_pool
 import psycopg
+from psycopg import sql
 from django.conf import settings
 
+from core import sse
+
 
 default_db = settings.DATABASES["default"]
 dbname = default_db["NAME"]
@@ -22,3 +29,84 @@ async def get_connection_pool() -> psycopg_pool.AsyncConnectionPool:
     if not _pool._opened:
         await _pool.open()
     return _pool
+
+
+class ListenHub:
+    """Fans out notifications from a single LISTEN connection.
+
+    The connection is opened lazily when the first subscriber arrives and is
+    kept open for the life of the process. If the connection fails the error
+    is delivered to every subscriber, as notifications are missed until the
+    channel is listened to again, and it is re-established with a delay
+    doubling from ``reconnect_delay`` up to ``max_reconnect_delay``.
+    """
+
+    def __init__(
+        self,
+        channel: str,
+        queue_size: int = 100,
+        reconnect_delay: float = 1.0,
+        max_reconnect_delay: float = 30.0,
+    ) -> None:
+        self._channel = channel
+        self._queue_size = queue_size
+        self._reconnect_delay = reconnect_delay
+        self._max_reconnect_delay = max_reconnect_delay
+        self._subscribers: set[asyncio.Queue[psycopg.Notify | psycopg.Error]] = set()
+        self._task: asyncio.Task | None = None
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscribers)
+
+    def _ensure_started(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._listen())
+
+    async def _listen(self) -> None:
+        delay = self._reconnect_delay
+
+        while True:
+            try:
+                conn = await psycopg.AsyncConnection.connect(conn_str, autocommit=True)
+                async with conn:
+                    await conn.execute(
+                        sql.SQL("LISTEN {};").format(sql.Identifier(self._channel))
+                    )
+                    delay = self._reconnect_delay
+
+                    async for notify in conn.notifies():
+                        self._publish(notify)
+            except psycopg.Error as ex:
+                print("LISTEN failed", self._channel, repr(ex))
+                self._publish(ex)
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, self._max_reconnect_delay)
+
+    def _publish(self, notify: psycopg.Notify | psycopg.Error) -> None:
+        for queue in self._subscribers:
+            sse.put_latest(queue, notify)
+
+    @contextlib.asynccontextmanager
+    async def subscribe(
+        self,
+    ) -> t.AsyncIterator[asyncio.Queue[psycopg.Notify | psycopg.Error]]:
+        queue: asyncio.Queue[psycopg.Notify | psycopg.Error] = asyncio.Queue(
+            self._queue_size
+        )
+        self._subscribers.add(queue)
+        self._ensure_started()
+
+        try:
+            yield queue
+        finally:
+            self._subscribers.discard(queue)
+
+
+_hubs: dict[str, ListenHub] = {}
+
+
+def get_listen_hub(channel: str) -> ListenHub:
+    if channel not in _hubs:
+        _hubs[channel] = ListenHub(channel)
+    return _hubs[channel]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:55
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("db", "0003_customer_versioning_trigger"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="customer",
+            index=django.contrib.postgres.indexes.GinIndex(
+                django.contrib.postgres.search.SearchVector(
+                    "name", "address", config="simple"
+                ),
+                name="cst_search_idx",
+            ),
+        ),
+    ]
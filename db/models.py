@@ -1,10 +1,15 @@
 from django.contrib.postgres import fields as pgfields
+from django.contrib.postgres import indexes as pgindexes
+from django.contrib.postgres import search as pgsearch
 from django.db import models
 from django.db.models import expressions as db_expressions
 from django.urls import reverse
 
 DEFAULT_VERSION = 1
 
+# Queries have to use this exact expression to use the customer search index.
+CUSTOMER_SEARCH_VECTOR = pgsearch.SearchVector("name", "address", config="simple")
+
 
 class DbError(Exception): ...
 
@@ -25,6 +30,7 @@ class Customer(models.Model):
     class Meta:
         verbose_name = "Customer"
         verbose_name_plural = "Customers"
+        indexes = [pgindexes.GinIndex(CUSTOMER_SEARCH_VECTOR, name="cst_search_idx")]
         constraints = [
             models.CheckConstraint(
                 name="cst_version_gt_0", condition=models.Q(version__gt=0)